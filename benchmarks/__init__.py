@@ -0,0 +1,11 @@
+# __init__.py
+"""Benchmarks for SplitsPy
+
+Run from the top-level directory of the repository, e.g.:
+
+    python -m benchmarks.cycle_methods
+
+
+LICENSE: This is open-source software released under the terms of the
+GPL (http://www.gnu.org/licenses/gpl.html).
+"""
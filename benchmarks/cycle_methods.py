@@ -0,0 +1,64 @@
+# cycle_methods.py
+"""Compares the circular orderings computed by exact and fast neighbor-net
+
+For each input, computes the circular ordering using each cycle method, computes split weights
+for the ordering and reports the running time of the cycle computation and the least squares fit.
+Inputs are the example matrices in examples/ and synthetic noisy circular matrices.
+
+Usage:
+    python -m benchmarks.cycle_methods [--mode CLS] [--sizes 30,60] [--seed 1]
+
+
+LICENSE: This is open-source software released under the terms of the
+GPL (http://www.gnu.org/licenses/gpl.html).
+"""
+import glob
+import os
+import time
+from optparse import OptionParser
+
+import numpy as np
+
+from benchmarks import generators
+from splitspy.nnet import distances, nnet_cycle, nnet_cycle_fast, nnet_splits
+from splitspy.splits.basic_split import split_dist
+
+__author__ = "Daniel H. Huson"
+
+METHODS = {"NNET": nnet_cycle.compute, "FAST": nnet_cycle_fast.compute}
+
+
+def run(name: str, labels: [str], matrix: [[float]], mode: str) -> None:
+    n_tax = len(labels)
+    for method, compute in METHODS.items():
+        a = time.perf_counter()
+        cycle = compute(labels, matrix)
+        b = time.perf_counter()
+        splits = nnet_splits.compute(n_tax, np.asarray(matrix), cycle, 0.0000001, mode != "OLS")
+        fit = distances.ls_fit(matrix, split_dist(n_tax, splits))
+        print(f"{name}\t{n_tax}\t{method}\t{b - a:0.4f}\t{fit:0.4f}\t{len(splits)}")
+
+
+def main():
+    parser = OptionParser("%prog [options]", description="Compare LS fit of exact and fast circular orderings")
+    parser.add_option("-m", "--mode", default="CLS", action="store", dest="mode", help="OLS or CLS")
+    parser.add_option("--sizes", default="30,60", action="store", dest="sizes",
+                      help="numbers of taxa of synthetic matrices (format: n1,n2,...)")
+    parser.add_option("--seed", default=1, action="store", dest="seed", type="int", help="random seed")
+    parser.add_option("--examples", default="examples", action="store", dest="examples",
+                      help="directory containing example matrices", metavar="DIR")
+    (options, args) = parser.parse_args()
+
+    print("input\tn_tax\tmethod\tseconds\tfit\tsplits")
+
+    for filename in sorted(glob.glob(os.path.join(options.examples, "*.txt"))):
+        labels, matrix = distances.read(filename)
+        run(os.path.basename(filename), labels, matrix, options.mode)
+
+    for n_tax in [int(a) for a in options.sizes.split(",") if a != ""]:
+        labels, matrix = generators.generate("noisy-circular", n_tax, options.seed)
+        run("noisy-circular", labels, matrix, options.mode)
+
+
+if __name__ == '__main__':
+    main()
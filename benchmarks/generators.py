@@ -0,0 +1,91 @@
+# generators.py
+"""Seeded generators of synthetic distance matrices
+
+    tree: additive (tree-like) distances on a random binary tree
+    circular: Kalmanson (circular) distances, namely Euclidean distances between points in convex position
+    noisy-tree, noisy-circular: the above, with multiplicative log-normal noise
+
+All generators return a list of labels and a 0-based symmetric numpy matrix with zero diagonal.
+Taxa are listed in random order.
+
+
+LICENSE: This is open-source software released under the terms of the
+GPL (http://www.gnu.org/licenses/gpl.html).
+"""
+from typing import Tuple, List
+
+import numpy as np
+
+__author__ = "Daniel H. Huson"
+
+NOISE = 0.1
+
+
+def tree(n_tax: int, seed: int = 1) -> Tuple[List[str], np.array]:
+    rng = np.random.default_rng(seed)
+    mat = np.zeros((n_tax, n_tax))
+
+    clusters = [[t] for t in range(0, n_tax)]
+    depths = [np.zeros(1) for t in range(0, n_tax)]
+
+    while len(clusters) > 1:
+        i, j = sorted(rng.choice(len(clusters), 2, replace=False))
+        a, b = clusters[i], clusters[j]
+        da = depths[i] + rng.exponential(0.1)
+        db = depths[j] + rng.exponential(0.1)
+        mat[np.ix_(a, b)] = da[:, None] + db[None, :]
+        mat[np.ix_(b, a)] = mat[np.ix_(a, b)].T
+
+        clusters[i] = a + b
+        depths[i] = np.concatenate((da, db))
+        clusters[j] = clusters[-1]
+        depths[j] = depths[-1]
+        clusters.pop()
+        depths.pop()
+
+    return __labels(n_tax), mat
+
+
+def circular(n_tax: int, seed: int = 1) -> Tuple[List[str], np.array]:
+    rng = np.random.default_rng(seed)
+    angles = rng.uniform(0.0, 2.0 * np.pi, n_tax)
+    points = np.column_stack((np.cos(angles), 0.5 * np.sin(angles)))
+
+    mat = np.empty((n_tax, n_tax))
+    for i in range(0, n_tax):
+        mat[i] = np.sqrt(((points - points[i]) ** 2).sum(axis=1))
+    np.fill_diagonal(mat, 0.0)
+
+    return __labels(n_tax), mat
+
+
+def noisy(mat: np.array, noise: float = NOISE, seed: int = 1) -> np.array:
+    rng = np.random.default_rng(seed + 1)
+    result = mat * rng.lognormal(0.0, noise, mat.shape)
+    result = np.triu(result, 1)
+    result += result.T
+    return result
+
+
+def generate(kind: str, n_tax: int, seed: int = 1) -> Tuple[List[str], np.array]:
+    """ generate a matrix of the named kind: tree, circular, noisy-tree or noisy-circular
+    """
+    if kind == "tree":
+        return tree(n_tax, seed)
+    elif kind == "circular":
+        return circular(n_tax, seed)
+    elif kind == "noisy-tree":
+        labels, mat = tree(n_tax, seed)
+        return labels, noisy(mat, seed=seed)
+    elif kind == "noisy-circular":
+        labels, mat = circular(n_tax, seed)
+        return labels, noisy(mat, seed=seed)
+    else:
+        raise IOError("Unknown kind of matrix:", kind)
+
+
+KINDS = ["tree", "circular", "noisy-tree", "noisy-circular"]
+
+
+def __labels(n_tax: int) -> List[str]:
+    return ["t" + str(t) for t in range(1, n_tax + 1)]
@@ -0,0 +1,63 @@
+# import_time.py
+"""Measures the time taken to import the outline program and checks that it does not import SciPy or PIL
+
+SciPy is only needed for --mode LP and PIL only for rendering an image, so neither may be imported
+when the program starts. Each measurement runs in a fresh interpreter. Exits with status 1 if a
+heavy module is imported at start-up.
+
+Usage:
+    python -m benchmarks.import_time [--repeat 5]
+
+
+LICENSE: This is open-source software released under the terms of the
+GPL (http://www.gnu.org/licenses/gpl.html).
+"""
+import subprocess
+import sys
+from optparse import OptionParser
+from typing import Tuple, List
+
+__author__ = "Daniel H. Huson"
+
+MODULE = "splitspy.outline"
+
+HEAVY = ["scipy", "PIL"]
+
+PROGRAM = f"""
+import sys, time
+a = time.perf_counter()
+import {MODULE}
+b = time.perf_counter()
+print(b - a)
+print(",".join(m for m in {HEAVY!r} if m in sys.modules))
+"""
+
+
+def measure() -> Tuple[float, List[str]]:
+    lines = subprocess.run([sys.executable, "-c", PROGRAM], capture_output=True, text=True,
+                           check=True).stdout.splitlines()
+    return float(lines[0]), [m for m in lines[1].split(",") if m != ""]
+
+
+def main():
+    parser = OptionParser("%prog [options]", description="Measure the import time of " + MODULE)
+    parser.add_option("--repeat", default=5, action="store", dest="repeat", type="int",
+                      help="number of measurements")
+    (options, args) = parser.parse_args()
+
+    times = []
+    imported = []
+    for i in range(0, options.repeat):
+        seconds, imported = measure()
+        times.append(seconds)
+
+    times.sort()
+    print(f"import {MODULE}: min {times[0]:0.4f} median {times[len(times) // 2]:0.4f} seconds")
+
+    if len(imported) > 0:
+        print("Heavy modules imported at start-up:", ",".join(imported))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
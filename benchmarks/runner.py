@@ -0,0 +1,209 @@
+# runner.py
+"""Times the stages of SplitsPy on synthetic distance matrices
+
+For each kind of matrix and each number of taxa, generates a seeded matrix (see generators.py),
+writes it to a temporary file and then times the stages distances.read, nnet_cycle.compute,
+nnet_splits.compute (OLS and CLS), nnet_splits_lp.compute (LP, small inputs only),
+outline_algo.compute and draw.draw, recording wall time, CPU time, peak memory and counters.
+
+For each stage, a summary of its output is also recorded. When a previous result file is
+given using --compare, timings are reported relative to it and the outputs are checked
+against it, so that performance work cannot silently change results.
+
+Usage:
+    python -m benchmarks.runner [--kinds tree,circular] [--sizes 50,100,200] [-o results.json]
+                                [--compare old.json]
+
+
+LICENSE: This is open-source software released under the terms of the
+GPL (http://www.gnu.org/licenses/gpl.html).
+"""
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from optparse import OptionParser
+
+import numpy as np
+
+from benchmarks import generators
+from splitspy import metrics
+from splitspy.graph import draw
+from splitspy.nnet import distances, nnet_cycle, nnet_cycle_fast, nnet_splits, nnet_splits_lp
+from splitspy.outlines import outline_algo
+
+__author__ = "Daniel H. Huson"
+
+VERSION = 1
+
+
+def run(kind: str, n_tax: int, seed: int, cycle_method: str, lp_max: int, memory: bool, workdir: str) -> [dict]:
+    labels, mat = generators.generate(kind, n_tax, seed)
+    infile = os.path.join(workdir, f"{kind}-{n_tax}.txt")
+    distances.write(labels, mat, infile)
+
+    results = []
+
+    def stage(name: str, func, summarize):
+        recorder = metrics.Metrics(trace_memory=False)
+        with metrics.recording(recorder):
+            with metrics.stage(name):
+                output = func()
+        record = recorder.stages[0]
+
+        if memory:
+            recorder = metrics.Metrics(trace_memory=True)
+            with metrics.recording(recorder):
+                with metrics.stage(name):
+                    func()
+            record["peak_memory"] = recorder.stages[0]["peak_memory"]
+
+        record.update({"kind": kind, "n_tax": n_tax, "seed": seed, "stage": name, "output": summarize(output)})
+        del record["name"]
+        results.append(record)
+        print(f"{kind}\t{n_tax}\t{name}\t{record['wall_time']:0.4f}\t{record['cpu_time']:0.4f}\t"
+              f"{record['peak_memory']}", file=sys.stderr)
+        return output
+
+    labels, matrix = stage("distances.read", lambda: distances.read(infile), lambda out: __summarize_matrix(out[1]))
+
+    if cycle_method == "FAST":
+        cycle = stage("nnet_cycle_fast.compute", lambda: nnet_cycle_fast.compute(labels, matrix),
+                      __summarize_cycle)
+    else:
+        cycle = stage("nnet_cycle.compute", lambda: nnet_cycle.compute(labels, matrix), __summarize_cycle)
+
+    mat = np.array(matrix)
+
+    stage("nnet_splits.compute[OLS]", lambda: nnet_splits.compute(n_tax, mat, cycle, 0.0000001, False),
+          lambda out: __summarize_splits(cycle, out))
+    splits = stage("nnet_splits.compute[CLS]", lambda: nnet_splits.compute(n_tax, mat, cycle, 0.0000001, True),
+                   lambda out: __summarize_splits(cycle, out))
+    if n_tax <= lp_max:
+        stage("nnet_splits_lp.compute[LP]", lambda: nnet_splits_lp.compute(n_tax, mat, cycle, 0.0000001),
+              lambda out: __summarize_splits(cycle, out))
+
+    graph, angles = stage("outline_algo.compute", lambda: outline_algo.compute(labels, cycle, splits),
+                          lambda out: __summarize_graph(out[0]))
+
+    outfile = os.path.join(workdir, f"{kind}-{n_tax}.png")
+    try:
+        stage("draw.draw", lambda: draw.draw(outfile, graph, angles), lambda out: {})
+    except OSError as ex:
+        print(f"{kind}\t{n_tax}\tdraw.draw\tskipped: {ex}", file=sys.stderr)
+
+    return results
+
+
+def compare(results: [dict], old: [dict], rtol: float) -> int:
+    """ compares timings and outputs with a previous run, returns the number of changed outputs
+    """
+    key = lambda r: (r["kind"], r["n_tax"], r["seed"], r["stage"])
+    old = {key(r): r for r in old}
+
+    changed = 0
+    print("kind\tn_tax\tstage\twall_time\tspeed-up\toutput", file=sys.stderr)
+    for r in results:
+        o = old.get(key(r))
+        if o is None:
+            continue
+        same = __same(r["output"], o["output"], rtol)
+        if not same:
+            changed += 1
+        speed_up = o["wall_time"] / r["wall_time"] if r["wall_time"] > 0 else float("inf")
+        print(f"{r['kind']}\t{r['n_tax']}\t{r['stage']}\t{r['wall_time']:0.4f}\t{speed_up:0.2f}x\t"
+              f"{'same' if same else 'CHANGED'}", file=sys.stderr)
+    return changed
+
+
+def __same(a, b, rtol: float) -> bool:
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(__same(a[k], b[k], rtol) for k in a)
+    elif isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(__same(x, y, rtol) for x, y in zip(a, b))
+    elif isinstance(a, float) or isinstance(b, float):
+        return bool(np.isclose(a, b, rtol=rtol, atol=rtol))
+    else:
+        return a == b
+
+
+def __summarize_matrix(matrix: [[float]]) -> dict:
+    mat = np.array(matrix)
+    return {"n": len(mat), "sum": float(mat.sum()), "max": float(mat.max())}
+
+
+def __summarize_cycle(cycle: [int]) -> dict:
+    return {"length": len(cycle), "sha256": hashlib.sha256(str(cycle).encode()).hexdigest()}
+
+
+def __summarize_splits(cycle: [int], splits) -> dict:
+    weights = sorted((sp.weight for sp in splits), reverse=True)
+    return {"n_splits": len(splits), "total_weight": float(sum(weights)),
+            "top_weights": [float(w) for w in weights[:10]]}
+
+
+def __summarize_graph(graph) -> dict:
+    x_min, x_max, y_min, y_max = graph.bbox()
+    return {"n_nodes": graph.n_nodes(), "n_edges": graph.n_edges(),
+            "bbox": [float(x_min), float(x_max), float(y_min), float(y_max)]}
+
+
+def __git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = OptionParser("%prog [options]", description="Time the stages of SplitsPy on synthetic matrices")
+    parser.add_option("-o", "--output", default="-", action="store", dest="outfile",
+                      help="output results file (JSON format)", metavar="FILE")
+    parser.add_option("--compare", default="", action="store", dest="compare",
+                      help="previous results file to compare timings and outputs with", metavar="FILE")
+    parser.add_option("--kinds", default=",".join(generators.KINDS), action="store", dest="kinds",
+                      help="kinds of matrices (format: kind1,kind2,...)")
+    parser.add_option("--sizes", default="50,100,200", action="store", dest="sizes",
+                      help="numbers of taxa (format: n1,n2,...), from 50 up to 10000")
+    parser.add_option("--seed", default=1, action="store", dest="seed", type="int", help="random seed")
+    parser.add_option("--cycle_method", default="NNET", action="store", dest="cycle_method",
+                      help="NNET or FAST", metavar="METHOD")
+    parser.add_option("--lp_max", default=50, action="store", dest="lp_max", type="int",
+                      help="largest number of taxa for which LP is timed", metavar="N")
+    parser.add_option("--rtol", default=0.0001, action="store", dest="rtol", type="float",
+                      help="relative tolerance when comparing outputs")
+    parser.add_option("--no_memory", default=True, action="store_false", dest="memory",
+                      help="don't record peak memory (saves a second, traced, run of each stage)")
+    (options, args) = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for kind in options.kinds.split(","):
+            for n_tax in [int(a) for a in options.sizes.split(",")]:
+                results += run(kind, n_tax, options.seed, options.cycle_method, options.lp_max, options.memory,
+                               workdir)
+
+    report = {"version": VERSION, "commit": __git_commit(), "python": platform.python_version(),
+              "numpy": np.__version__, "platform": platform.platform(), "results": results}
+
+    if options.outfile == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(options.outfile, mode="w") as outs:
+            json.dump(report, outs, indent=2)
+
+    if options.compare != "":
+        with open(options.compare) as ins:
+            changed = compare(results, json.load(ins)["results"], options.rtol)
+        if changed > 0:
+            print(f"Outputs changed: {changed}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,7 +9,7 @@ import setuptools
 
 setuptools.setup(name='SplitsPy',
                  version='0.0.10',
-                 packages=setuptools.find_packages(),
+                 packages=setuptools.find_packages(exclude=['benchmarks', 'benchmarks.*']),
                  url='http://github.com/husonlab/SplitsPhy',
                  license='GPL',
                  author='Daniel H. Huson',
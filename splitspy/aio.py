@@ -0,0 +1,183 @@
+# aio.py
+"""Runs SplitsPy from asyncio code without blocking the event loop
+
+The CPU-bound stages are run in an executor: the default thread pool of the event loop or a
+given ThreadPoolExecutor or ProcessPoolExecutor (recommended for large inputs, as the stages are
+mostly pure Python and hold the GIL). Progress events (see progress.py) are passed to a callback
+on the event loop or are yielded by stream().
+
+When the awaiting task is cancelled, e.g. by asyncio.wait_for(), the running stage is stopped at
+its next progress check (inside the join loop of neighbor-net and the conjugate gradient loop of
+least squares) and no further stages are started. To bound the latency without losing the
+result, pass a budget instead: the split weights are then the best found in the given time.
+
+Example:
+
+    with ProcessPoolExecutor() as executor:
+        runner = aio.Runner(executor)
+        cycle, splits, fit = await asyncio.wait_for(runner.run(labels, matrix, outfile="out.png"), 60)
+        runner.close()
+
+
+LICENSE: This is open-source software released under the terms of the
+GPL (http://www.gnu.org/licenses/gpl.html).
+"""
+import asyncio
+import functools
+import queue
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Tuple, List, Set
+
+from splitspy.progress import Cancelled
+
+__author__ = "Daniel H. Huson"
+
+INTERVAL = 0.1  # minimum number of seconds between two progress events passed on by a worker
+
+
+class Runner:
+    def __init__(self, executor: Executor = None):
+        """ runs the stages of SplitsPy in the given executor
+            Parameters
+            ----------
+                executor: Executor
+                    thread or process pool, or None for the default executor of the event loop
+        """
+        self.executor = executor
+        self.__manager = None
+
+    async def neighbor_net(self, labels: [str], matrix: [[float]], cutoff: float = 0.0001, mode: str = "CLS",
+                           cycle_method: str = "NNET", max_size: int = 0, top_k: int = 0, weights: [[float]] = None,
+                           budget: float = 0.0, progress: Callable[[dict], None] = None) -> Tuple[list, list]:
+        """ runs neighbor-net, see nnet_algo.neighbor_net. Returns the cycle and the splits
+        """
+        from splitspy.nnet import nnet_algo
+        return await self.__call(nnet_algo.neighbor_net, (labels, matrix, cutoff, mode, cycle_method, max_size, top_k,
+                                                          weights), {"budget": budget}, True, progress)
+
+    async def outline(self, labels: [str], cycle: [int], splits: list, rooted: bool = False, alt: bool = False,
+                      out_grp: Set[int] = None) -> Tuple:
+        """ computes the outline, see outline_algo.compute. Returns the graph (an ArrayGraph) and the label angles
+
+            With a process pool, the graph arrays are copied back from the worker, use run() or render() to avoid this
+        """
+        from splitspy.outlines import outline_algo
+        return await self.__call(outline_algo.compute, (labels, cycle, splits, rooted, alt, out_grp), {})
+
+    async def render(self, labels: [str], matrix: [[float]], cycle: [int], splits: list, **kwargs) -> float:
+        """ computes the fit and the outline and writes the requested outputs, see outline.render.
+            Returns the fit
+        """
+        from splitspy import outline
+        kwargs["show"] = False
+        return await self.__call(outline.render, (labels, matrix, cycle, splits), kwargs)
+
+    async def run(self, labels: [str], matrix: [[float]], outfile: str = "", nexus_file: str = "",
+                  graph_file: str = "", mode: str = "CLS", cutoff: float = 0.0, cycle_method: str = "NNET",
+                  max_size: int = 0, top_k: int = 0, weights: [[float]] = None, budget: float = 0.0,
+                  rooted: bool = False,
+                  alt: bool = False, out_grp: Set[int] = None, win_width: int = 1000, win_height: int = 800,
+                  m_left: int = 100, m_right: int = 100, m_top: int = 100, m_bot: int = 100, font_size: int = 12,
+                  progress: Callable[[dict], None] = None) -> Tuple[List[int], list, float]:
+        """ runs neighbor-net, computes the outline and writes the requested outputs, like outline.run.
+            Returns the cycle, the splits and the fit
+        """
+        cycle, splits = await self.neighbor_net(labels, matrix, cutoff, mode, cycle_method, max_size, top_k, weights,
+                                                budget, progress)
+        if progress is not None:
+            progress({"stage": "render"})
+        fit = await self.render(labels, matrix, cycle, splits, outfile=outfile, nexus_file=nexus_file,
+                                graph_file=graph_file, rooted=rooted, alt=alt, out_grp=out_grp, win_width=win_width,
+                                win_height=win_height, m_left=m_left, m_right=m_right, m_top=m_top, m_bot=m_bot,
+                                font_size=font_size)
+        return cycle, splits, fit
+
+    async def stream(self, labels: [str], matrix: [[float]], **kwargs):
+        """ runs run() and yields its progress events, followed by a final event
+            {"stage": "done", "cycle": ..., "splits": ..., "fit": ...}
+        """
+        events = asyncio.Queue()
+        task = asyncio.ensure_future(self.run(labels, matrix, progress=events.put_nowait, **kwargs))
+        task.add_done_callback(lambda t: events.put_nowait(None))
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+            cycle, splits, fit = task.result()
+            yield {"stage": "done", "cycle": cycle, "splits": splits, "fit": fit}
+        finally:
+            task.cancel()
+
+    def close(self) -> None:
+        """ shuts down the helper process used to communicate with a process pool, if any
+        """
+        if self.__manager is not None:
+            self.__manager.shutdown()
+            self.__manager = None
+
+    async def __call(self, func, args: tuple, kwargs: dict, takes_progress: bool = False,
+                     progress: Callable[[dict], None] = None):
+        loop = asyncio.get_running_loop()
+
+        if isinstance(self.executor, ProcessPoolExecutor):
+            if self.__manager is None:
+                import multiprocessing
+                self.__manager = multiprocessing.Manager()
+            cancel, events = self.__manager.Event(), (self.__manager.Queue() if progress is not None else None)
+        else:
+            cancel, events = threading.Event(), (queue.Queue() if progress is not None else None)
+
+        future = loop.run_in_executor(self.executor,
+                                      functools.partial(run_stage, func, args, kwargs, takes_progress, cancel, events))
+
+        forward = None
+        if events is not None:
+            forward = asyncio.ensure_future(forward_events(loop, events, progress))
+
+        try:
+            return await future
+        except asyncio.CancelledError:
+            cancel.set()
+            raise
+        finally:
+            if forward is not None:
+                events.put(None)
+                await asyncio.shield(forward)
+
+
+def run_stage(func, args: tuple, kwargs: dict, takes_progress: bool, cancel, events):
+    """ runs func in a worker thread or process. If takes_progress is set, func is given a progress callback
+        that passes on events to the events queue at most every INTERVAL seconds and raises Cancelled once
+        cancel has been set
+    """
+    last = [0.0]
+
+    def progress(event: dict) -> None:
+        now = time.monotonic()
+        if now - last[0] >= INTERVAL:
+            last[0] = now
+            if cancel.is_set():
+                raise Cancelled()
+            if events is not None:
+                events.put(event)
+
+    if cancel.is_set():
+        raise Cancelled()
+    if takes_progress:
+        return func(*args, progress=progress, **kwargs)
+    else:
+        return func(*args, **kwargs)
+
+
+async def forward_events(loop, events, progress: Callable[[dict], None]) -> None:
+    """ passes the events put by run_stage() to the progress callback, on the event loop, until None is put
+    """
+    while True:
+        event = await loop.run_in_executor(None, events.get)
+        if event is None:
+            break
+        progress(event)
@@ -0,0 +1,146 @@
+# fileio.py
+"""Opening of input and output files and streams with transparent (de)compression
+
+Compressed input (gzip, bzip2 or xz) is recognized by its magic bytes, not by the file name,
+so that it also works for standard input. Output is gzip-compressed, if the file name ends on .gz.
+
+
+LICENSE: This is open-source software released under the terms of the
+GPL (http://www.gnu.org/licenses/gpl.html).
+"""
+import io
+import queue
+import sys
+import threading
+from typing import Iterable
+
+__author__ = "Daniel H. Huson"
+
+GZIP_MAGIC = b"\x1f\x8b"
+BZIP2_MAGIC = b"BZh"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+
+BUFFER_SIZE = 1 << 20  # bytes buffered by output files
+
+
+def open_input(filename: str = "-") -> io.TextIOBase:
+    """ opens the named file, or standard input for -, for reading text, decompressing it, if necessary.
+        Closing the result closes the file, but not the standard input
+    """
+    if filename == "-":
+        if not hasattr(sys.stdin, "buffer"):  # e.g. a StringIO, which holds text, so cannot be compressed
+            return __UnclosedText(sys.stdin)
+        # reads through sys.stdin.buffer, so that data buffered there is not lost, but never closes it
+        source = io.BufferedReader(__UnclosedRaw(sys.stdin.buffer))
+        magic = source.peek(len(XZ_MAGIC))[:len(XZ_MAGIC)]
+        raw = source
+    else:
+        # the decompressors are given the file name, so that they own, and close, the file
+        source = filename
+        with open(filename, mode="rb") as ins:
+            magic = ins.read(len(XZ_MAGIC))
+        raw = None
+
+    if magic.startswith(GZIP_MAGIC):
+        import gzip
+        raw = gzip.open(source, mode="rb")
+    elif magic.startswith(BZIP2_MAGIC):
+        import bz2
+        raw = bz2.open(source, mode="rb")
+    elif magic.startswith(XZ_MAGIC):
+        import lzma
+        raw = lzma.open(source, mode="rb")
+    elif raw is None:
+        raw = open(filename, mode="rb")
+
+    return io.TextIOWrapper(raw, encoding="utf-8")
+
+
+class __UnclosedRaw(io.RawIOBase):
+    """ reads from a binary stream, closing this reader does not close the stream
+    """
+    def __init__(self, stream):
+        self.__stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        data = self.__stream.read1(len(b)) if hasattr(self.__stream, "read1") else self.__stream.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+class __UnclosedText(io.TextIOBase):
+    """ reads from a text stream, closing this reader does not close the stream
+    """
+    def __init__(self, stream):
+        self.__stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        return self.__stream.read(size)
+
+    def readline(self, size: int = -1) -> str:
+        return self.__stream.readline(size)
+
+
+def open_output(filename: str = "-") -> io.TextIOBase:
+    """ opens the named file, or standard output for -, for writing text, compressing it, if the name ends on .gz.
+        Close the result, unless it is sys.stdout
+    """
+    if filename == "-":
+        return sys.stdout
+    elif filename.endswith(".gz"):
+        import gzip
+        raw = gzip.GzipFile(filename, mode="wb", compresslevel=6)
+        return io.TextIOWrapper(io.BufferedWriter(raw, buffer_size=BUFFER_SIZE), encoding="utf-8")
+    else:
+        return open(filename, mode="w", buffering=BUFFER_SIZE, encoding="utf-8")
+
+
+def prefetch(items: Iterable, size: int = 2):
+    """ iterates over items in a background thread, keeping at most size items ahead of the consumer,
+        so that reading and parsing overlap with processing the items
+    """
+    buffer = queue.Queue(maxsize=size)
+    done = object()
+    stop = threading.Event()
+
+    def put(entry) -> bool:
+        """ waits until there is room for the entry, returns False, if the consumer stopped first
+        """
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except BaseException as ex:
+            put((done, ex))
+        finally:
+            if hasattr(items, "close"):
+                items.close()  # e.g. closes the input of a generator that reads from a file
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, ex = buffer.get()
+            if item is done:
+                if ex is not None:
+                    raise ex
+                return
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,130 @@
+# array_graph.py
+"""A compact graph implementation using arrays
+
+Nodes are numbered 0..n_nodes-1, their positions are held in an (n_nodes,2) array and their labels
+in a dict. Edges are numbered 0..n_edges-1 and are held in an (n_edges,2) array of end nodes, with
+arrays of weights and split ids. Adjacency in compressed sparse row (CSR) form is built on demand.
+Use to_graph() to obtain the equivalent linked-list Graph.
+
+
+LICENSE: This is open-source software released under the terms of the
+GPL (http://www.gnu.org/licenses/gpl.html).
+"""
+import sys
+from typing import Dict, Tuple
+
+import numpy as np
+from splitspy import fileio
+from splitspy.graph.graph import Graph
+
+__author__ = 'Daniel H. Huson'
+
+
+class ArrayGraph:
+    def __init__(self, positions: np.array, edges: np.array, weights: np.array = None, splits: np.array = None,
+                 labels: Dict[int, str] = None):
+        """ a graph given by arrays
+            Parameters
+            ----------
+                positions: np.array
+                    (n_nodes,2) node positions
+                edges: np.array
+                    (n_edges,2) source and target node of each edge
+                weights: np.array
+                    edge weights, -1 for none
+                splits: np.array
+                    split id of each edge, -1 for none
+                labels: Dict[int, str]
+                    node labels, by node
+        """
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        self.edges = np.asarray(edges, dtype=int).reshape(-1, 2)
+        self.weights = np.full(len(self.edges), -1.0) if weights is None else np.asarray(weights, dtype=float)
+        self.splits = np.full(len(self.edges), -1) if splits is None else np.asarray(splits, dtype=int)
+        self.labels = {} if labels is None else labels
+        self.__csr = None
+
+    def n_nodes(self) -> int:
+        return len(self.positions)
+
+    def n_edges(self) -> int:
+        return len(self.edges)
+
+    def bbox(self):
+        if self.n_nodes() == 0:
+            return 1000000.0, -1000000.0, 1000000.0, -1000000.0
+        x_min, y_min = self.positions.min(axis=0).tolist()
+        x_max, y_max = self.positions.max(axis=0).tolist()
+        return x_min, x_max, y_min, y_max
+
+    def adjacency(self) -> Tuple[np.array, np.array, np.array]:
+        """ the adjacency in CSR form: the neighbors of node v are nodes[offsets[v]:offsets[v+1]], joined to v
+            by the edges edge_ids[offsets[v]:offsets[v+1]]
+            Returns
+            -------
+                np.array
+                    offsets
+                np.array
+                    nodes
+                np.array
+                    edge_ids
+        """
+        if self.__csr is None:
+            ends = np.concatenate((self.edges[:, 0], self.edges[:, 1]))
+            others = np.concatenate((self.edges[:, 1], self.edges[:, 0]))
+            edge_ids = np.tile(np.arange(self.n_edges()), 2)
+
+            order = np.argsort(ends, kind="stable")
+            offsets = np.zeros(self.n_nodes() + 1, dtype=int)
+            np.cumsum(np.bincount(ends, minlength=self.n_nodes()), out=offsets[1:])
+            self.__csr = offsets, others[order], edge_ids[order]
+        return self.__csr
+
+    def deg(self, v: int) -> int:
+        offsets = self.adjacency()[0]
+        return int(offsets[v + 1] - offsets[v])
+
+    def neighbors(self, v: int) -> np.array:
+        offsets, nodes, _ = self.adjacency()
+        return nodes[offsets[v]:offsets[v + 1]]
+
+    def to_graph(self) -> Graph:
+        """ the equivalent Graph, node v becomes the node with id v+1
+        """
+        graph = Graph()
+        nodes = graph.new_nodes(self.positions)
+        for v, label in self.labels.items():
+            nodes[v].label = label
+        for (v, w), weight, s in zip(self.edges.tolist(), self.weights.tolist(), self.splits.tolist()):
+            graph.new_edge(nodes[v], nodes[w], None, weight, s if s >= 0 else None)
+        return graph
+
+    @staticmethod
+    def from_graph(graph: Graph):
+        """ the array graph for the given graph, keeping node positions and labels, edge weights and the edge
+            infos that are split ids
+        """
+        nodes = list(graph.nodes())
+        index = {v.id(): i for i, v in enumerate(nodes)}
+        positions = [v.pos if v.pos is not None else (0.0, 0.0) for v in nodes]
+        labels = {i: v.label for i, v in enumerate(nodes) if v.label is not None}
+
+        edges = [(index[e.src().id()], index[e.tar().id()]) for e in graph.edges()]
+        weights = [e.weight for e in graph.edges()]
+        splits = [e.info if isinstance(e.info, (int, np.integer)) else -1 for e in graph.edges()]
+        return ArrayGraph(positions, edges, weights, splits, labels)
+
+    def write_tgf(self, outfile="-") -> None:
+        """ writes the graph in trivial graph format, numbering nodes from 1, gzip-compressed, if the file name
+            ends on .gz
+        """
+        outs = fileio.open_output(outfile)
+
+        lines = [f"{v + 1}  {self.labels[v]} [{x:.6f},{y:.6f}]" if v in self.labels else f"{v + 1} [{x:.6f},{y:.6f}]"
+                 for v, (x, y) in enumerate(self.positions.tolist())]
+        lines.extend(f"{v + 1} {w + 1}" + (f" [{weight:.6f}]" if weight != -1 else "") + (f" {{{s}}}" if s >= 0 else "")
+                     for (v, w), weight, s in zip(self.edges.tolist(), self.weights.tolist(), self.splits.tolist()))
+        outs.write("\n".join(lines) + "\n" if len(lines) > 0 else "")
+
+        if outs != sys.stdout:
+            outs.close()
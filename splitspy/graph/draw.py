@@ -1,7 +1,8 @@
 # draw.py
 """Draws a phylogenetic outline
 
-Draws a phylogenetic outline
+Draws a phylogenetic outline. Files ending on .svg (or .svg.gz) or .pdf are written as vector
+graphics, all others are rendered as raster images using Pillow
 
 See: Huson et al (2021)
 
@@ -9,28 +10,77 @@ See: Huson et al (2021)
 LICENSE: This is open-source software released under the terms of the
 GPL (http://www.gnu.org/licenses/gpl.html).
 """
+import functools
 import math
-from typing import Tuple
-from PIL import Image, ImageDraw, ImageFont
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+from splitspy.graph import vector
 from splitspy.graph.graph import Graph
+from splitspy.graph.array_graph import ArrayGraph
 
 __author__ = 'Daniel H. Huson'
 
 
-def draw(outfile: str, graph: Graph, label_angles: [float] = None, fit: float = -1.0,
+def draw(outfile: str, graph: ArrayGraph, label_angles: [float] = None, fit: float = -1.0,
          width: int = 1000, height: int = 1000,
          m_left: int = 150, m_right: int = 150, m_top: int = 150, m_bot: int = 150,
          font_size: int = 12, scale_factor: int =5) -> None:
+    """ draws the graph to the named file or, if no file is given, shows it in a window.
+        Raster images are rendered scale_factor times larger than the given width and height
+    """
+    if isinstance(graph, Graph):
+        graph = ArrayGraph.from_graph(graph)
+
+    name = "" if outfile is None else outfile.lower()
+    if name.endswith(".svg") or name.endswith(".svg.gz") or name.endswith(".pdf"):
+        points, labels = __layout(graph, label_angles, width, height, m_left, m_right, m_top, m_bot, font_size,
+                                  lambda label: vector.text_size(label, font_size))
+        write = vector.write_pdf if name.endswith(".pdf") else vector.write_svg
+        write(outfile, width, height, points, graph.edges, labels, font_size, fit)
+        return
+
+    from PIL import Image, ImageDraw
 
     width *= scale_factor
     height *= scale_factor
-    m_left *= scale_factor
-    m_right *= scale_factor
-    m_top *= scale_factor
-    m_bot *= scale_factor
     font_size *= scale_factor
     line_width = scale_factor
 
+    font = load_font(font_size)
+    black = (0, 0, 0)
+
+    line_height = sum(font.getmetrics()) if hasattr(font, "getmetrics") else font.getbbox("Ay")[3]
+    points, labels = __layout(graph, label_angles, width, height, m_left * scale_factor, m_right * scale_factor,
+                              m_top * scale_factor, m_bot * scale_factor, font_size,
+                              lambda label: (font.getbbox(label)[2], line_height))
+    points = list(map(tuple, points.tolist()))
+
+    im = Image.new("RGB", (width, height), (255, 255, 255))
+
+    im_draw = ImageDraw.Draw(im)
+
+    if fit != -1:
+        im_draw.text((40*scale_factor, 10*scale_factor), "Fit: " + ("{:.2f}".format(fit)), font=load_font(10*scale_factor), fill=black)
+
+    for v, w in graph.edges.tolist():
+        im_draw.line([points[v], points[w]], width=line_width, fill=black)
+
+    for label, pos in labels:
+        im_draw.text(pos, label, font=font, fill=black)
+
+    if outfile is None or outfile == "":
+        im.show()
+    else:
+        im.save(outfile)
+
+
+def __layout(graph: ArrayGraph, label_angles: [float], width: int, height: int, m_left: float, m_right: float,
+             m_top: float, m_bot: float, font_size: int, text_size: Callable[[str], Tuple[float, float]]):
+    """ maps the node positions into the drawing area, keeping the aspect ratio, and places the labels, using
+        text_size() to obtain the width and height of each label.
+        Returns the (n_nodes,2) array of mapped positions and each label with the top left corner of its box
+    """
     bw = width - m_left - m_right
     bh = height - m_top - m_bot
 
@@ -49,48 +99,52 @@ def draw(outfile: str, graph: Graph, label_angles: [float] = None, fit: float =
 
     map_y = lambda a: bh / (y_max - y_min) * (a - y_min) + m_top
 
-    im = Image.new("RGB", (width, height), (255, 255, 255))
-
-    im_draw = ImageDraw.Draw(im)
-
-    font = ImageFont.truetype("Arial",size=font_size)
-    black = (0, 0, 0)
-
-    if fit != -1:
-        im_draw.text((40*scale_factor, 10*scale_factor), "Fit: " + ("{:.2f}".format(fit)), font=ImageFont.truetype("Arial",size=10*scale_factor), fill=black)
-
     center = (0.5 * width, 0.5 * height)
 
-    points = {}
-    for v in graph.nodes():
-        points[v] = (map_x(v.pos[0]), map_y(v.pos[1]))
-
-    for e in graph.edges():
-        im_draw.line([points[e.src()], points[e.tar()]], width=line_width, fill=black)
+    points = np.column_stack((map_x(graph.positions[:, 0]), map_y(graph.positions[:, 1])))
 
+    labels: List[Tuple[str, Tuple[float, float]]] = []
     boxes = []
+    grid = {}
     i = 1
-    for v in graph.nodes():
-        if v.label is not None:
-            if v.label == "Root":
-                angle = 90
-            else:
-                angle = label_angles[i] if label_angles is not None else __angle(center, points[v])
-            i += 1
-            pos = __label_pos(v.label, font_size, angle, points[v], boxes)
-            im_draw.text(pos, v.label, font=font, fill=black)
-
-    if outfile is None or outfile == "":
-        im.show()
-    else:
-        im.save(outfile)
-
-
-def __label_pos(label: str, font_size: int, angle: float, pt: Tuple[float,float], boxes: [[Tuple[float,float], float, float]]) -> Tuple[float,float]:
-    direct = __translate((0, 0), angle)
-
-    lw = 0.6 * font_size * len(label)
-    lh = font_size
+    for v, label in sorted(graph.labels.items()):
+        pt = tuple(points[v].tolist())
+        if label == "Root":
+            angle = 90
+        else:
+            angle = label_angles[i] if label_angles is not None else __angle(center, pt)
+        i += 1
+        labels.append((label, __label_pos(text_size(label), font_size, angle, pt, boxes, grid)))
+    return points, labels
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(size: int):
+    """ loads Arial in the given size, or a fallback font, if Arial is not available. Fonts are cached
+    """
+    from PIL import ImageFont
+
+    for name in ["Arial", "arial.ttf", "DejaVuSans.ttf"]:
+        try:
+            return ImageFont.truetype(name, size=size)
+        except OSError:
+            pass
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def __label_pos(size: Tuple[float, float], font_size: int, angle: float, pt: Tuple[float, float],
+                boxes: [[Tuple[float, float], float, float]],
+                grid: Dict[Tuple[int, int], List[int]]) -> Tuple[float, float]:
+    """ places a label of the given size next to the point pt, in the direction of angle. If the label overlaps
+        previously placed labels, it is moved away from pt until it does not. The boxes of placed labels are
+        indexed by a grid of cells, so that only nearby labels are checked
+    """
+    direct = __translate((0, 0), angle, 1.0)
+
+    lw, lh = size
     delta = 0.2 * font_size
 
     if -direct[0] <= direct[1] <= direct[0]:  # right
@@ -105,22 +159,49 @@ def __label_pos(label: str, font_size: int, angle: float, pt: Tuple[float,float]
         loc = (0, 0)
 
     box = [loc, lw, lh]
-
-    changed = True
-    while changed:
-        changed = False
-        for other in boxes:
-            while __intersects(box, other):
-                box[0] = __translate(box[0], angle, 5)
-                changed = True
-            if changed:
-                break
-
+    cell = 4.0 * font_size
+
+    # each move clears one of the overlapping labels for good, as the label only ever moves in one direction
+    while True:
+        near = sorted({b for c in __cells(box, cell) for b in grid.get(c, [])})
+        other = next((boxes[b] for b in near if __intersects(box, boxes[b])), None)
+        if other is None:
+            break
+        box[0] = __translate(box[0], angle, __clearance(box, other, direct) + 0.1 * font_size)
+
+    for c in __cells(box, cell):
+        grid.setdefault(c, []).append(len(boxes))
     boxes.append(box)
 
     return box[0]
 
 
+def __cells(box: [Tuple[float, float], float, float], cell: float) -> List[Tuple[int, int]]:
+    """ the grid cells that the box overlaps
+    """
+    (x, y), w, h = box
+    return [(i, j) for i in range(math.floor(x / cell), math.floor((x + w) / cell) + 1)
+            for j in range(math.floor(y / cell), math.floor((y + h) / cell) + 1)]
+
+
+def __clearance(box: [Tuple[float, float], float, float], other: [Tuple[float, float], float, float],
+                direct: Tuple[float, float]) -> float:
+    """ the distance that the box must move in the unit direction direct to no longer overlap other
+    """
+    (x, y), w, h = box
+    (ox, oy), ow, oh = other
+    dists = []
+    if direct[0] > 0:
+        dists.append((ox + ow - x) / direct[0])
+    elif direct[0] < 0:
+        dists.append((x + w - ox) / -direct[0])
+    if direct[1] > 0:
+        dists.append((oy + oh - y) / direct[1])
+    elif direct[1] < 0:
+        dists.append((y + h - oy) / -direct[1])
+    return max(0.0, min(dists))
+
+
 def __angle(a: Tuple[float, float], b: Tuple[float, float]) -> float:
     p = (b[0] - a[0], b[1] - a[1])
     if p[0] != 0:
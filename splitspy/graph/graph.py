@@ -1,6 +1,10 @@
 # graph.py
 """A simple graph implementation using linked lists
 
+Each node keeps pointers to the first and last of its outgoing and incoming edges, so that adding
+an edge takes constant time. If requested, the graph also keeps a count of edges per pair of nodes,
+so that adjacency can be tested in constant time.
+
 See: Huson et al (2021)
 
 
@@ -9,11 +13,17 @@ GPL (http://www.gnu.org/licenses/gpl.html).
 """
 
 import sys
+from collections import Counter
+
+from splitspy import fileio
 
 __author__ = 'Daniel H. Huson'
 
 
 class Node:
+    __slots__ = ("__id", "label", "pos", "info", "__prev", "__next", "__first_src_edge", "__last_src_edge",
+                 "__first_tar_edge", "__last_tar_edge", "__in_deg", "__out_deg")
+
     def __init__(self, _id: int, label: str = None, pos: [float] = None, info=None):
         self.__id = _id
         self.label = label
@@ -24,7 +34,9 @@ class Node:
         self.__next = None
 
         self.__first_src_edge = None
+        self.__last_src_edge = None
         self.__first_tar_edge = None
+        self.__last_tar_edge = None
 
         self.__in_deg = 0
         self.__out_deg = 0
@@ -64,16 +76,20 @@ class Node:
             e = e._Edge__next_src_edge
 
     def is_adjacent(self, other) -> bool:
-        for e in self.adj_edges():
-            if e.src() == other or e.tar() == other:
+        """ tests adjacency by scanning the edges of the node of smaller degree, see Graph.is_adjacent()
+            for a constant time test
+        """
+        v, w = (self, other) if self.deg() <= other.deg() else (other, self)
+        for e in v.adj_edges():
+            if e.opp(v) is w:
                 return True
         return False
 
     def children(self):
-        e = self.__first_tar_edge
+        e = self.__first_src_edge
         while e is not None:
             yield e.tar()
-            e = e._Edge__next_tar_edge
+            e = e._Edge__next_src_edge
 
     def parents(self) -> []:
         e = self.__first_tar_edge
@@ -98,6 +114,9 @@ class Node:
 
 
 class Edge:
+    __slots__ = ("__id", "__src", "__tar", "label", "weight", "info", "__prev", "__next", "__next_src_edge",
+                 "__prev_src_edge", "__next_tar_edge", "__prev_tar_edge")
+
     def __init__(self, _id: int, src: Node, tar: Node, label: str = None, weight: float = 1, info=None):
         self.__id = _id
         self.__src = src
@@ -156,7 +175,15 @@ class Edge:
 
 
 class Graph(object):
-    def __init__(self):
+    def __init__(self, adjacency: bool = False):
+        """ an empty graph
+            Parameters
+            ----------
+                adjacency: bool
+                    maintain a count of edges per pair of nodes, for constant time adjacency tests
+        """
+        self.__adjacency = Counter() if adjacency else None
+
         self.__first_node = None
         self.__last_node = None
         self.__first_edge = None
@@ -186,6 +213,9 @@ class Graph(object):
         self.__n_nodes = 0
         self.__n_edges = 0
 
+        if self.__adjacency is not None:
+            self.__adjacency.clear()
+
     def new_node(self, label: str = None, pos: [float] = None, info=None) -> Node:
         self.__top_node_id += 1
         v = Node(self.__top_node_id, label, pos, info)
@@ -202,6 +232,11 @@ class Graph(object):
 
         return v
 
+    def new_nodes(self, positions) -> [Node]:
+        """ creates one node per row of the given array of positions, returns the new nodes in order
+        """
+        return [self.new_node(pos=pos) for pos in positions.tolist()]
+
     def new_edge(self, src: Node, tar: Node, label: str = None, weight: float = -1, info=None) -> Edge:
         self.__top_edge_id += 1
         edge = Edge(self.__top_edge_id, src, tar, label, weight, info)
@@ -214,64 +249,89 @@ class Graph(object):
             self.__last_edge._Edge__next = edge
             self.__last_edge = edge
 
-        p = src._Node__first_src_edge
+        p = src._Node__last_src_edge
         if p is None:
             src._Node__first_src_edge = edge
         else:
-            while p._Edge__next_src_edge is not None:
-                p = p._Edge__next_src_edge
             p._Edge__next_src_edge = edge
             edge._Edge__prev_src_edge = p
+        src._Node__last_src_edge = edge
+        src._Node__out_deg += 1
 
-        q = tar._Node__first_tar_edge
+        q = tar._Node__last_tar_edge
         if q is None:
             tar._Node__first_tar_edge = edge
         else:
-            while q._Edge__next_tar_edge is not None:
-                q = q._Edge__next_tar_edge
             q._Edge__next_tar_edge = edge
             edge._Edge__prev_tar_edge = q
+        tar._Node__last_tar_edge = edge
+        tar._Node__in_deg += 1
+
+        if self.__adjacency is not None:
+            self.__adjacency[self.__pair(src, tar)] += 1
 
         self.__n_edges += 1
 
         return edge
 
+    def is_adjacent(self, v: Node, w: Node) -> bool:
+        """ tests whether v and w are joined by an edge, in constant time, if the graph maintains adjacency
+        """
+        if self.__adjacency is not None:
+            return self.__adjacency[self.__pair(v, w)] > 0
+        return v.is_adjacent(w)
+
+    @staticmethod
+    def __pair(v: Node, w: Node):
+        return (v.id(), w.id()) if v.id() <= w.id() else (w.id(), v.id())
+
     def delete_edge(self, edge: Edge) -> None:
         src = edge.src()
         if src._Node__first_src_edge is edge:
             src._Node__first_src_edge = edge._Edge__next_src_edge
         else:
             edge._Edge__prev_src_edge._Edge__next_src_edge = edge._Edge__next_src_edge
-
-        if edge._Edge__next_src_edge is not None:
+        if src._Node__last_src_edge is edge:
+            src._Node__last_src_edge = edge._Edge__prev_src_edge
+        else:
             edge._Edge__next_src_edge._Edge__prev_src_edge = edge._Edge__prev_src_edge
+        src._Node__out_deg -= 1
 
         tar = edge.tar()
         if tar._Node__first_tar_edge is edge:
             tar._Node__first_tar_edge = edge._Edge__next_tar_edge
         else:
-            edge._Edge__prev_tar_edge._Edge__next = edge._Edge__next_tar_edge
-
-        if edge._Edge__next_tar_edge is not None:
-            edge._Edge__next_tar_edge._Edge__prev = edge._Edge__prev_tar_edge
+            edge._Edge__prev_tar_edge._Edge__next_tar_edge = edge._Edge__next_tar_edge
+        if tar._Node__last_tar_edge is edge:
+            tar._Node__last_tar_edge = edge._Edge__prev_tar_edge
+        else:
+            edge._Edge__next_tar_edge._Edge__prev_tar_edge = edge._Edge__prev_tar_edge
+        tar._Node__in_deg -= 1
 
         if self.__first_edge is edge:
             self.__first_edge = edge._Edge__next
+        else:
+            edge._Edge__prev._Edge__next = edge._Edge__next
         if self.__last_edge is edge:
             self.__last_edge = edge._Edge__prev
+        else:
+            edge._Edge__next._Edge__prev = edge._Edge__prev
 
-        if edge._Edge__prev is not None:
-            h = edge._Edge__next
-            k = edge._Edge__prev
-            k._Edge__next = h
+        if self.__adjacency is not None:
+            pair = self.__pair(src, tar)
+            self.__adjacency[pair] -= 1
+            if self.__adjacency[pair] == 0:
+                del self.__adjacency[pair]
 
-        if edge._Edge__next is not None:
-            edge._Edge__next._Edge__prev = edge._Edge__prev
+        edge._Edge__prev = edge._Edge__next = None
+        edge._Edge__prev_src_edge = edge._Edge__next_src_edge = None
+        edge._Edge__prev_tar_edge = edge._Edge__next_tar_edge = None
 
         self.__n_edges -= 1
 
     def delete_node(self, node: Node) -> None:
-        for e in node.adj_edges():
+        # a self-loop is listed twice
+        for e in set(node.adj_edges()):
             self.delete_edge(e)
 
         if self.__first_node is node:
@@ -326,29 +386,30 @@ class Graph(object):
         return x_min, x_max, y_min, y_max
 
     def write_tgf(self, outfile="-") -> None:
-        if outfile == "-":
-            outs = sys.stdout
-        else:
-            outs = open(outfile, mode="w")
+        """ writes the graph in trivial graph format, gzip-compressed, if the file name ends on .gz
+        """
+        outs = fileio.open_output(outfile)
 
+        lines = []
         for v in self.nodes():
-            print(v.id(), end="", file=outs)
+            line = str(v.id())
             if v.label is not None:
-                print(" ", v.label, end="", file=outs)
+                line += "  " + str(v.label)
             if v.pos is not None:
-                print(" [", "{:.6f}".format(v.pos[0]), ",", "{:.6f}".format(v.pos[1]), "]",
-                      sep="", end="", file=outs)
+                line += f" [{v.pos[0]:.6f},{v.pos[1]:.6f}]"
             if v.info is not None:
-                print(" {", v.info, "}", sep="", end="", file=outs)
-            print()
+                line += f" {{{v.info}}}"
+            lines.append(line)
 
         for e in self.edges():
-            print(e.src().id(), e.tar().id(), end="", file=outs)
+            line = f"{e.src().id()} {e.tar().id()}"
             if e.weight != -1:
-                print(" [", "{:.6f}".format(e.weight), "]", sep="", end="", file=outs)
+                line += f" [{e.weight:.6f}]"
             if e.info is not None:
-                print(" {", e.info, "}", sep="", end="", file=outs)
-            print()
+                line += f" {{{e.info}}}"
+            lines.append(line)
+
+        outs.write("\n".join(lines) + "\n" if len(lines) > 0 else "")
 
         if outs != sys.stdout:
             outs.close()
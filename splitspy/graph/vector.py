@@ -0,0 +1,153 @@
+# vector.py
+"""Writes a drawing of a graph as vector graphics, in SVG or PDF format
+
+The edges are written as a single path, in which an edge that starts where the previous
+edge ended continues the current line, and the labels are written as text. Coordinates are
+in pixels (SVG) or points (PDF), with the origin at the top left, as for raster images.
+Neither format requires Pillow.
+
+
+LICENSE: This is open-source software released under the terms of the
+GPL (http://www.gnu.org/licenses/gpl.html).
+"""
+import sys
+import zlib
+from typing import List, Tuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+from splitspy import fileio
+
+__author__ = "Daniel H. Huson"
+
+FONT_FAMILY = "Arial, Helvetica, sans-serif"
+ASCENT = 0.9  # height of the baseline below the top of a label, relative to the font size
+CHUNK_SIZE = 10000  # number of edges formatted at a time
+
+# advance widths of the printable ASCII characters 32..126 in Helvetica (and Arial), in 1/1000 of the font size
+HELVETICA_WIDTHS = [278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+                    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+                    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+                    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+                    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+                    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584]
+
+
+def text_size(text: str, font_size: float) -> Tuple[float, float]:
+    """ the width and height of the text in the font used for labels, other characters count as digits
+    """
+    return 0.001 * font_size * sum(HELVETICA_WIDTHS[ord(c) - 32] if 32 <= ord(c) <= 126 else 556
+                                   for c in text), font_size
+
+
+def write_svg(outfile: str, width: int, height: int, points: np.array, edges: np.array,
+              labels: List[Tuple[str, Tuple[float, float]]], font_size: int = 12, fit: float = -1.0) -> None:
+    """ writes the drawing in SVG format, gzip-compressed, if the file name ends on .gz
+        Parameters
+        ----------
+            outfile: str
+                output file
+            width: int
+                width of the drawing
+            height: int
+                height of the drawing
+            points: np.array
+                (n_nodes,2) position of each node
+            edges: np.array
+                (n_edges,2) source and target node of each edge
+            labels: List[Tuple[str, Tuple[float, float]]]
+                each label and the position of its top left corner
+            font_size: int
+                font size of the labels
+            fit: float
+                fit shown in the top left corner, unless -1
+    """
+    outs = fileio.open_output(outfile)
+
+    outs.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+               f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+               f'viewBox="0 0 {width} {height}">\n'
+               '<rect width="100%" height="100%" fill="white"/>\n')
+    if fit != -1:
+        outs.write(f'<text x="40" y="{10 + ASCENT * 10:.2f}" font-family="{FONT_FAMILY}" font-size="10">'
+                   f'Fit: {fit:.2f}</text>\n')
+
+    outs.write('<path fill="none" stroke="black" stroke-width="1" stroke-linecap="round" stroke-linejoin="round" '
+               'd="')
+    for chunk in __segments(points, edges):
+        outs.write("".join(f"M{x1:.2f} {y1:.2f}L{x2:.2f} {y2:.2f}" if move else f"L{x2:.2f} {y2:.2f}"
+                           for move, x1, y1, x2, y2 in chunk) + "\n")
+    outs.write('"/>\n')
+
+    outs.write(f'<g font-family="{FONT_FAMILY}" font-size="{font_size}" fill="black">\n')
+    outs.write("".join(f'<text x="{x:.2f}" y="{y + ASCENT * font_size:.2f}">{escape(label)}</text>\n'
+                       for label, (x, y) in labels))
+    outs.write("</g>\n</svg>\n")
+
+    if outs != sys.stdout:
+        outs.close()
+
+
+def write_pdf(outfile: str, width: int, height: int, points: np.array, edges: np.array,
+              labels: List[Tuple[str, Tuple[float, float]]], font_size: int = 12, fit: float = -1.0) -> None:
+    """ writes the drawing as a single page PDF, with the labels in Helvetica. See write_svg() for the parameters
+    """
+    content = ["1 w 1 J 1 j 0 G"]
+    for chunk in __segments(points, edges):
+        content.extend(f"{x1:.2f} {height - y1:.2f} m {x2:.2f} {height - y2:.2f} l" if move
+                       else f"{x2:.2f} {height - y2:.2f} l" for move, x1, y1, x2, y2 in chunk)
+    content.append("S")
+
+    texts = [(f"Fit: {fit:.2f}", (40, 10), 10)] if fit != -1 else []
+    texts.extend((label, pos, font_size) for label, pos in labels)
+    content.append("BT 0 g")
+    content.extend(f"/F1 {size} Tf 1 0 0 1 {x:.2f} {height - y - ASCENT * size:.2f} Tm ({__pdf_string(text)}) Tj"
+                   for text, (x, y), size in texts)
+    content.append("ET")
+    stream = zlib.compress("\n".join(content).encode("latin-1"))
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>",
+               b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+               f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] "
+               f"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>".encode("ascii"),
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+               f"<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode("ascii") + stream
+               + b"\nendstream"]
+
+    parts = [b"%PDF-1.4\n"]
+    offsets = []
+    size = len(parts[0])
+    for i, body in enumerate(objects, 1):
+        part = f"{i} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+        offsets.append(size)
+        parts.append(part)
+        size += len(part)
+
+    parts.append(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii"))
+    parts.extend(f"{offset:010d} 00000 n \n".encode("ascii") for offset in offsets)
+    parts.append(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{size}\n%%EOF\n".encode("ascii"))
+
+    if outfile == "-":
+        sys.stdout.buffer.write(b"".join(parts))
+    else:
+        with open(outfile, mode="wb") as outs:
+            outs.write(b"".join(parts))
+
+
+def __segments(points: np.array, edges: np.array):
+    """ the edges as rows (move, x1, y1, x2, y2), in chunks. move is False, if the edge starts at the end of
+        the previous edge, so that it can continue the current line
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    edges = np.asarray(edges, dtype=int).reshape(-1, 2)
+    move = np.ones(len(edges), dtype=bool)
+    move[1:] = edges[1:, 0] != edges[:-1, 1]
+    for start in range(0, len(edges), CHUNK_SIZE):
+        chunk = edges[start:start + CHUNK_SIZE]
+        yield zip(move[start:start + CHUNK_SIZE].tolist(), *points[chunk[:, 0]].T.tolist(),
+                  *points[chunk[:, 1]].T.tolist())
+
+
+def __pdf_string(text: str) -> str:
+    text = text.encode("cp1252", errors="replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
@@ -0,0 +1,207 @@
+# metrics.py
+"""Records timings, peak memory and counters for the stages of a computation
+
+Nothing is recorded unless a Metrics object has been activated using recording(), so the
+module-level functions stage(), count() and value() can be called from any algorithm at no
+noticeable cost. Counters and values are attributed to the innermost open stage.
+Peak memory per stage is only traced on request, as tracemalloc slows down pure Python
+code several-fold and so inflates the recorded times; max_rss is always recorded.
+
+Example:
+
+    m = metrics.Metrics()
+    with metrics.recording(m):
+        with metrics.stage("read"):
+            ...
+    m.write("metrics.json")
+
+
+LICENSE: This is open-source software released under the terms of the
+GPL (http://www.gnu.org/licenses/gpl.html).
+"""
+import contextlib
+import contextvars
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable, Iterable, Iterator, Tuple
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+__author__ = "Daniel H. Huson"
+
+VERSION = 1
+
+__current = contextvars.ContextVar("metrics", default=None)
+
+
+class Metrics:
+    def __init__(self, trace_memory: bool = False, callback: Callable[[dict], None] = None):
+        """ records stages
+            Parameters
+            ----------
+                trace_memory: bool
+                    record peak memory per stage using tracemalloc (slows down pure Python code)
+                callback: Callable[[dict], None]
+                    called with the record of each stage when it ends
+        """
+        self.trace_memory = trace_memory
+        self.callback = callback
+        self.stages = []
+        self.__open = []
+        self.__started_tracing = False
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.__started_tracing = True
+
+        record = {"name": name, "wall_time": 0.0, "cpu_time": 0.0, "peak_memory": None, "counters": {}}
+        if len(self.__open) > 0:
+            record["parent"] = self.__open[-1][0]["name"]
+
+        self.__update_peak()
+        self.__open.append([record, 0])
+        self.stages.append(record)
+
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_time"] = time.perf_counter() - wall
+            record["cpu_time"] = time.process_time() - cpu
+
+            self.__update_peak()
+            peak = self.__open.pop()[1]
+            if self.trace_memory:
+                record["peak_memory"] = peak
+                if len(self.__open) > 0:
+                    self.__open[-1][1] = max(self.__open[-1][1], peak)
+            record["max_rss"] = max_rss()
+
+            if len(self.__open) == 0 and self.__started_tracing:
+                tracemalloc.stop()
+                self.__started_tracing = False
+
+            if self.callback is not None:
+                self.callback(record)
+
+    def add(self, name: str, wall_time: float, cpu_time: float) -> dict:
+        """ adds a stage that was timed elsewhere, e.g. in another thread, as a child of the innermost open stage
+        """
+        record = {"name": name, "wall_time": wall_time, "cpu_time": cpu_time, "peak_memory": None, "counters": {},
+                  "max_rss": max_rss()}
+        if len(self.__open) > 0:
+            record["parent"] = self.__open[-1][0]["name"]
+        self.stages.append(record)
+        if self.callback is not None:
+            self.callback(record)
+        return record
+
+    def count(self, name: str, n: int = 1) -> None:
+        if len(self.__open) > 0:
+            counters = self.__open[-1][0]["counters"]
+            counters[name] = counters.get(name, 0) + n
+
+    def value(self, name: str, v) -> None:
+        if len(self.__open) > 0:
+            self.__open[-1][0]["counters"][name] = v
+
+    def report(self) -> dict:
+        top = [r for r in self.stages if "parent" not in r]
+        return {"version": VERSION,
+                "trace_memory": self.trace_memory,
+                "stages": self.stages,
+                "total": {"wall_time": sum(r["wall_time"] for r in top),
+                          "cpu_time": sum(r["cpu_time"] for r in top),
+                          "max_rss": max_rss()}}
+
+    def write(self, filename: str = "-") -> None:
+        if filename == "-":
+            json.dump(self.report(), sys.stdout, indent=2)
+            print()
+        else:
+            with open(filename, mode="w") as outs:
+                json.dump(self.report(), outs, indent=2)
+
+    def __update_peak(self) -> None:
+        if self.trace_memory and tracemalloc.is_tracing() and len(self.__open) > 0:
+            self.__open[-1][1] = max(self.__open[-1][1], tracemalloc.get_traced_memory()[1])
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+
+
+@contextlib.contextmanager
+def recording(metrics: Metrics):
+    """ activates the given metrics object for the current context
+    """
+    token = __current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        __current.reset(token)
+
+
+def current() -> Metrics:
+    return __current.get()
+
+
+def stage(name: str):
+    """ context manager that records the named stage, if metrics are being recorded
+    """
+    metrics = __current.get()
+    return contextlib.nullcontext() if metrics is None else metrics.stage(name)
+
+
+def add(name: str, wall_time: float, cpu_time: float) -> None:
+    """ adds a stage that was timed elsewhere, if metrics are being recorded
+    """
+    metrics = __current.get()
+    if metrics is not None:
+        metrics.add(name, wall_time, cpu_time)
+
+
+def timed(items: Iterable) -> Iterator[Tuple[object, float, float]]:
+    """ yields each item together with the wall time and the CPU time of the current thread taken to produce it.
+        Use with fileio.prefetch() and add(), as stages cannot be recorded in a background thread
+    """
+    items = iter(items)
+    try:
+        while True:
+            wall = time.perf_counter()
+            cpu = time.thread_time()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            yield item, time.perf_counter() - wall, time.thread_time() - cpu
+    finally:
+        if hasattr(items, "close"):
+            items.close()
+
+
+def count(name: str, n: int = 1) -> None:
+    metrics = __current.get()
+    if metrics is not None:
+        metrics.count(name, n)
+
+
+def value(name: str, v) -> None:
+    metrics = __current.get()
+    if metrics is not None:
+        metrics.value(name, v)
+
+
+def max_rss() -> int:
+    """ maximum resident set size of the process so far, in bytes, or -1, if not available
+    """
+    if resource is None:
+        return -1
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else 1024 * rss
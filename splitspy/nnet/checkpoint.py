@@ -0,0 +1,88 @@
+# checkpoint.py
+"""Checkpoints of long neighbor-net runs
+
+A checkpoint file (NumPy .npz format) holds the circular ordering and the state of the
+active set method used for constrained least squares (x, old_x, the active set as bits,
+whether the first pass is still in progress, and the numbers of conjugate gradient
+iterations and of changes of the active set so far), together with a hash of the input
+and the options, so that a run is only ever resumed with the same input. Files are
+replaced atomically, so a run that is killed while writing leaves the previous
+checkpoint intact.
+
+
+LICENSE: This is open-source software released under the terms of the
+GPL (http://www.gnu.org/licenses/gpl.html).
+"""
+import hashlib
+import os
+import time
+
+import numpy as np
+from splitspy import metrics
+
+__author__ = "Daniel H. Huson"
+
+VERSION = 1
+
+
+class Checkpoint:
+    def __init__(self, filename: str, interval: float = 600.0, resume: bool = False):
+        """ periodically saved state of a neighbor-net run
+            Parameters
+            ----------
+                filename: str
+                    checkpoint file
+                interval: float
+                    minimum number of seconds between two saves of the solver state
+                resume: bool
+                    continue from the state saved in the file, if it exists
+        """
+        self.filename = filename
+        self.interval = interval
+        self.state = {}
+        self.last_saved = time.perf_counter()
+
+        if resume and os.path.exists(filename):
+            with np.load(filename) as data:
+                self.state = {key: data[key] for key in data.files}
+            if int(self.state.get("version", -1)) != VERSION:
+                raise IOError("Unsupported checkpoint file:", filename)
+            self.__key = str(self.state["key"])
+        else:
+            self.__key = None
+
+    def start(self, labels: [str], mat: [[float]], *options) -> None:
+        """ checks that the checkpoint belongs to the given input and options, or starts a new one
+        """
+        h = hashlib.sha256()
+        h.update("\t".join(labels).encode())
+        h.update(np.ascontiguousarray(mat, dtype=float).tobytes())
+        for option in options:
+            h.update(np.ascontiguousarray(option, dtype=float).tobytes() if isinstance(option, np.ndarray)
+                     or isinstance(option, list) else repr(option).encode())
+        key = h.hexdigest()
+
+        if self.__key is not None and self.__key != key:
+            raise IOError("Checkpoint file was written for a different input or different options:", self.filename)
+        if self.__key is None:
+            self.state = {"version": np.array(VERSION), "key": np.array(key)}
+            self.__key = key
+
+    def get(self, name: str):
+        return self.state.get(name)
+
+    def due(self) -> bool:
+        return time.perf_counter() - self.last_saved >= self.interval
+
+    def save(self, **arrays) -> None:
+        """ updates the state with the given arrays and writes it to the file
+        """
+        self.state.update({name: np.asarray(value) for name, value in arrays.items()})
+
+        tmp_file = self.filename + ".tmp"
+        with open(tmp_file, "wb") as outs:
+            np.savez(outs, **self.state)
+        os.replace(tmp_file, self.filename)
+
+        self.last_saved = time.perf_counter()
+        metrics.count("checkpoints")
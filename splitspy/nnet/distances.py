@@ -9,43 +9,69 @@ GPL (http://www.gnu.org/licenses/gpl.html).
 
 import math
 import sys
-from typing import Tuple, List
+from typing import Tuple, List, Iterator
+
+import numpy as np
+from splitspy import fileio
 
 __author__ = 'Daniel H. Huson'
 
+MISSING = {"?", "NA", "-"}
 
-def read(filename="-") -> Tuple[List[str], List[List[float]]]:
-    if filename == "-":
-        ins = sys.stdin
-    else:
-        ins = open(filename)
-
-    n = 0
-
-    labels = []
-    rows = []
-
-    for line in ins:
-        if n == 0:
-            n = int(line)
-            if n <= 0:
-                raise IOError("Number of taxa must be positive, got:", line)
-        else:
-            tokens = line.replace("\\s\\s", " ").split()
-            if len(tokens) != n + 1:
-                raise IOError("Wrong number of tokens in line, got:", line)
-            labels.append(tokens[0])
-            row = []
-            for i in range(1, n + 1):
-                row.append(float(tokens[i]))
-            rows.append(row)
-
-    if ins != sys.stdin:
-        ins.close()
 
+def read(filename="-") -> Tuple[List[str], List[List[float]]]:
+    """ reads a single distance matrix, the input may be compressed
+    """
+    matrices = read_all(filename)
+    try:
+        labels, rows = next(matrices)
+    except StopIteration:
+        raise IOError("No distance matrix found in:", filename)
+    if next(matrices, None) is not None:
+        raise IOError("More than one distance matrix found (use --batch) in:", filename)
     return labels, rows
 
 
+def read_all(filename="-") -> Iterator[Tuple[List[str], List[List[float]]]]:
+    """ reads a stream of concatenated distance matrices, yielding one matrix at a time, the input may be
+        compressed. Empty lines between matrices are ignored
+    """
+    ins = fileio.open_input(filename)
+
+    try:
+        n = 0
+        labels = []
+        rows = []
+
+        for line in ins:
+            if n == 0:
+                if line.strip() == "":
+                    continue
+                n = int(line)
+                if n <= 0:
+                    raise IOError("Number of taxa must be positive, got:", line)
+            else:
+                tokens = line.replace("\\s\\s", " ").split()
+                if len(tokens) != n + 1:
+                    raise IOError("Wrong number of tokens in line, got:", line)
+                labels.append(tokens[0])
+                row = []
+                for i in range(1, n + 1):
+                    row.append(math.nan if tokens[i] in MISSING else float(tokens[i]))
+                rows.append(row)
+
+                if len(rows) == n:
+                    yield labels, rows
+                    n = 0
+                    labels = []
+                    rows = []
+
+        if n > 0:
+            raise IOError(f"Incomplete matrix, expected {n} rows, got:", len(rows))
+    finally:
+        ins.close()
+
+
 def write(labels: [str], matrix: [[float]], filename="-") -> None:
     if filename == "-":
         outs = sys.stdout
@@ -55,11 +81,7 @@ def write(labels: [str], matrix: [[float]], filename="-") -> None:
     print(n, file=outs)
 
     for i in range(0, n):
-        print(labels[i], end="", file=outs)
-        row = matrix[i]
-        for value in row:
-            print(" ", value, end="", file=outs)
-        print(end="\n", file=outs)
+        outs.write(labels[i] + " " + " ".join(map(str, matrix[i])) + "\n")
 
     if outs != sys.stdout:
         outs.close()
@@ -70,7 +92,67 @@ def ls_fit(dist: [[float]], sdist: [[float]]) -> float:
     diff_sum2 = 0.0
     for i in range(0, len(dist)):
         for j in range(0, len(dist[i])):
-            d_sum2 += dist[i][j] * dist[i][j]
-            diff_sum2 *= (dist[i][j] - sdist[i][j])*(dist[i][j] - sdist[i][j])
+            if not math.isnan(dist[i][j]):
+                d_sum2 += dist[i][j] * dist[i][j]
+                diff_sum2 += (dist[i][j] - sdist[i][j])*(dist[i][j] - sdist[i][j])
 
     return max(0.0, 100.0 * (1.0 - diff_sum2 / d_sum2))
+
+
+def has_missing(matrix: [[float]]) -> bool:
+    return bool(np.isnan(np.asarray(matrix, dtype=float)).any())
+
+
+def fill_missing(matrix: [[float]]) -> np.array:
+    """ replaces missing distances by the shortest two-step path d(i,k)+d(k,j) over known distances,
+        or by the mean known distance, if there is no such path. Used to compute the circular ordering only
+
+        Parameters
+        ----------
+            matrix: [[float]]
+                distance matrix, 0-based, missing entries are NaN
+        Returns
+        -------
+            np.array
+                distance matrix without missing entries
+    """
+    mat = np.array(matrix, dtype=float)
+    missing = np.isnan(mat)
+    np.fill_diagonal(missing, False)
+
+    mean = np.nanmean(mat[~missing]) if np.any(~missing) else 0.0
+    filled = mat.copy()
+
+    for i in np.flatnonzero(missing.any(axis=1)):
+        cols = np.flatnonzero(missing[i])
+        with np.errstate(all="ignore"):
+            paths = mat[i, :, None] + mat[:, cols]
+            paths[~np.isfinite(paths)] = np.inf
+            filled[i, cols] = paths.min(axis=0)
+    filled[np.isinf(filled)] = mean
+    filled[missing] = np.minimum(filled, filled.T)[missing]
+    np.fill_diagonal(filled, 0.0)
+
+    return filled
+
+
+def fm_weights(matrix: [[float]]) -> np.array:
+    """ Fitch-Margoliash weights 1/d^2, zero for missing distances, zero distances get the largest weight
+    """
+    mat = np.asarray(matrix, dtype=float)
+    return __inverse(mat * mat)
+
+
+def variance_weights(variances: [[float]]) -> np.array:
+    """ weights 1/v for a matrix of variances v, zero for missing variances, zero variances get the largest weight
+    """
+    return __inverse(np.asarray(variances, dtype=float))
+
+
+def __inverse(values: np.array) -> np.array:
+    weights = np.zeros(values.shape)
+    positive = values > 0
+    weights[positive] = 1.0 / values[positive]
+    largest = weights.max() if np.any(positive) else 1.0
+    weights[values == 0] = largest
+    return weights
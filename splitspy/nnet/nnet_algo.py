@@ -9,27 +9,55 @@ LICENSE: This is open-source software released under the terms of the
 GPL (http://www.gnu.org/licenses/gpl.html).
 """
 import time
-from typing import Tuple
+from typing import Tuple, Callable
 
 __author__ = "David J. Bryant and Daniel H. Huson"
 
-from splitspy.nnet import nnet_cycle, nnet_splits, nnet_splits_lp
-
-
-def neighbor_net(labels: [str], mat: [[float]], cutoff=0.0001, mode: str = "CLS") -> Tuple[list, list]:
-    a = time.perf_counter()
-    cycle = nnet_cycle.compute(labels, mat)
-    b = time.perf_counter()
-    print(f"Computed circular order in {b-a:0.4f} seconds")
-
-    a = time.perf_counter()
-    if mode == "LP":
-        splits = nnet_splits_lp.compute(len(labels), mat, cycle, cutoff)
-    else:
-        constrained = (mode != "OLS")
-        splits = nnet_splits.compute(len(labels), mat, cycle, cutoff, constrained)
-
-    b = time.perf_counter()
-    print(f"Computed splits in {b-a:0.4f} seconds (mode={mode})")
+from splitspy import metrics
+from splitspy.nnet import distances, nnet_cycle, nnet_cycle_fast, nnet_splits
+from splitspy.nnet.checkpoint import Checkpoint
+
+
+def neighbor_net(labels: [str], mat: [[float]], cutoff=0.0001, mode: str = "CLS", cycle_method: str = "NNET",
+                 max_size: int = 0, top_k: int = 0, weights: [[float]] = None,
+                 progress: Callable[[dict], None] = None, budget: float = 0.0,
+                 checkpoint: Checkpoint = None) -> Tuple[list, list]:
+    """ computes the neighbor-net cycle and splits. A positive budget (in seconds) bounds the total time: the cycle
+        is always computed completely, the split weights computed in the remaining time are the best found so far.
+        If a checkpoint is given, the cycle and the state of the CLS computation are saved to it and a run is
+        continued from the state that it holds
+    """
+    start = time.perf_counter()
+
+    if checkpoint is not None:
+        checkpoint.start(labels, mat, mode, cycle_method, max_size, top_k, weights)
+
+    with metrics.stage("nnet_cycle"):
+        metrics.value("cycle_method", cycle_method)
+        if checkpoint is not None and checkpoint.get("cycle") is not None:
+            cycle = checkpoint.get("cycle").tolist()
+            metrics.value("resumed", True)
+        else:
+            cycle_mat = distances.fill_missing(mat) if distances.has_missing(mat) else mat
+            if cycle_method == "FAST":
+                cycle = nnet_cycle_fast.compute(labels, cycle_mat, progress=progress)
+            else:
+                cycle = nnet_cycle.compute(labels, cycle_mat, progress)
+            if checkpoint is not None:
+                checkpoint.save(cycle=cycle)
+
+    if budget > 0:
+        budget = max(budget - (time.perf_counter() - start), 0.000001)
+
+    with metrics.stage("nnet_splits"):
+        metrics.value("mode", mode)
+        if mode == "LP":
+            from splitspy.nnet import nnet_splits_lp  # imports SciPy, so only when needed
+            splits = nnet_splits_lp.compute(len(labels), mat, cycle, cutoff, progress, budget)
+        else:
+            constrained = (mode != "OLS")
+            splits = nnet_splits.compute(len(labels), mat, cycle, cutoff, constrained, max_size, top_k, weights,
+                                         progress, budget, checkpoint)
+        metrics.value("splits", len(splits))
 
     return cycle, splits
@@ -9,13 +9,31 @@ LICENSE: This is open-source software released under the terms of the
 GPL (http://www.gnu.org/licenses/gpl.html).
 """
 from collections import deque
+from typing import Callable
 import numpy as np
+from splitspy import metrics
+from splitspy.progress import Monitor
 from splitspy.nnet.nnet_node import NetNode
 
 __author__ = "David J. Bryant and Daniel H. Huson"
 
 
-def compute(labels: [str], matrix: [[float]]) -> [int]:
+def compute(labels: [str], matrix: [[float]], progress: Callable[[dict], None] = None) -> [int]:
+    """ compute the neighbor-net circular ordering
+        Parameters
+        ----------
+            labels: [str]
+                taxon labels
+            matrix: [[float]]
+                distance matrix, 0-based
+            progress: Callable[[dict], None]
+                if given, called after each join with the number of joins completed and of active nodes,
+                may raise progress.Cancelled to stop the computation
+        Returns
+        -------
+            [int]
+                circular ordering, 1-based, with cycle[0]=0
+    """
     n = len(labels)
 
     if n <= 3:
@@ -25,11 +43,11 @@ def compute(labels: [str], matrix: [[float]]) -> [int]:
 
     mat = __setup_matrix(labels, matrix)  # matrix is 0-based, mat is 1-based
 
-    joins = __join_nodes(n, mat, nodes_head)
+    joins = __join_nodes(n, mat, nodes_head, Monitor(progress))
 
     cycle = __expand_nodes(joins, nodes_head)
 
-    cycle = __normalize_cycle(cycle)
+    cycle = normalize_cycle(cycle)
 
     return cycle
 
@@ -54,17 +72,13 @@ def __setup_matrix(labels: [str], matrix: [float]) -> np.array:
     n = len(labels)
     max_number_of_nodes = max(3, 3 * n - 5)
 
-    mat = np.empty(((max_number_of_nodes + 1), (max_number_of_nodes + 1)))
-
-    for i in range(0, max_number_of_nodes):
-        for j in range(0, max_number_of_nodes):
-            if i < n and j < n:
-                mat[i+1][j+1] = matrix[i][j]
+    mat = np.zeros(((max_number_of_nodes + 1), (max_number_of_nodes + 1)))
+    mat[1:n + 1, 1:n + 1] = np.asarray(matrix, dtype=float)[:n, :n]
 
     return mat
 
 
-def __join_nodes(n: int, mat: np.array, nodes_head: NetNode) -> [NetNode]:
+def __join_nodes(n: int, mat: np.array, nodes_head: NetNode, monitor: Monitor) -> [NetNode]:
     num_nodes = n
     num_active = n
     num_clusters = n
@@ -186,6 +200,8 @@ def __join_nodes(n: int, mat: np.array, nodes_head: NetNode) -> [NetNode]:
                 x = c_x.nbr
                 y = c_y.nbr
 
+        metrics.count("joins")
+
         if x.nbr is None and y.nbr is None:
             __join2way(x, y)
             num_clusters -= 1
@@ -204,6 +220,8 @@ def __join_nodes(n: int, mat: np.array, nodes_head: NetNode) -> [NetNode]:
             num_active -= 2
             num_clusters -= 1
 
+        monitor.report({"stage": "nnet_cycle", "joins": n - num_clusters, "active": num_active})
+
     return joins
 
 
@@ -323,7 +341,7 @@ def __expand_nodes(joins: [NetNode], nodes_head: NetNode) -> [int]:
     return cycle
 
 
-def __normalize_cycle(cycle: [int]) -> [int]:
+def normalize_cycle(cycle: [int]) -> [int]:
     pos_of_1 = 1
     for i in range(1, len(cycle)):
         if cycle[i] == 1:
@@ -0,0 +1,113 @@
+# nnet_cycle_fast.py
+"""Computes an approximate circular ordering for large sets of taxa
+
+Runs neighbor-net on a backbone of well-spread taxa (chosen by farthest-point sampling),
+assigns every remaining taxon to the backbone edge at which it is cheapest to insert it
+and then orders the taxa assigned to each edge recursively. For a fixed sample size
+this takes O(n^2) time (dominated by looking at the distances) rather than O(n^3).
+
+See: Bryant and Moulton (2004)
+
+
+LICENSE: This is open-source software released under the terms of the
+GPL (http://www.gnu.org/licenses/gpl.html).
+"""
+from typing import Callable
+
+import numpy as np
+from splitspy.nnet import nnet_cycle
+
+__author__ = "Daniel H. Huson"
+
+SAMPLE_SIZE = 32
+
+
+def compute(labels: [str], matrix: [[float]], sample_size: int = SAMPLE_SIZE,
+            progress: Callable[[dict], None] = None) -> [int]:
+    """ compute an approximate circular ordering
+        Parameters
+        ----------
+            labels: [str]
+                taxon labels
+            matrix: [[float]]
+                distance matrix, 0-based
+            sample_size: int
+                number of backbone taxa ordered exactly by neighbor-net at each level
+            progress: Callable[[dict], None]
+                passed to each run of neighbor-net on a backbone
+        Returns
+        -------
+            [int]
+                circular ordering, 1-based, with cycle[0]=0
+    """
+    n = len(labels)
+    sample_size = max(4, sample_size)
+
+    if n <= sample_size:
+        return nnet_cycle.compute(labels, matrix, progress)
+
+    mat = np.asarray(matrix, dtype=float)
+
+    order = __circular_order(mat, np.arange(n), sample_size, progress)
+
+    cycle = [0]
+    cycle.extend(int(t) + 1 for t in order)
+
+    return nnet_cycle.normalize_cycle(cycle)
+
+
+def __circular_order(mat: np.array, ids: np.array, sample_size: int, progress: Callable[[dict], None]) -> np.array:
+    if len(ids) <= sample_size:
+        return __nnet_order(mat, ids, progress)
+
+    backbone = __nnet_order(mat, __farthest_points(mat, ids, sample_size), progress)
+    others = np.setdiff1d(ids, backbone, assume_unique=True)
+    succ = np.roll(backbone, -1)
+
+    dist = mat[np.ix_(others, backbone)]
+    cost = dist + np.roll(dist, -1, axis=1) - mat[backbone, succ]
+    edge = np.argmin(cost, axis=1)
+
+    by_edge = np.argsort(edge, kind="stable")
+    bounds = np.searchsorted(edge[by_edge], np.arange(len(backbone) + 1))
+
+    order = []
+    for k in range(0, len(backbone)):
+        order.append(backbone[k])
+        members = others[by_edge[bounds[k]:bounds[k + 1]]]
+        if len(members) > 0:
+            order.extend(__path(mat, members, backbone[k], succ[k], sample_size, progress))
+    return np.array(order)
+
+
+def __path(mat: np.array, members: np.array, a: int, b: int, sample_size: int,
+           progress: Callable[[dict], None]) -> np.array:
+    if len(members) <= 2:
+        return members[np.argsort(mat[members, a] - mat[members, b], kind="stable")]
+
+    order = list(__circular_order(mat, np.concatenate(([a, b], members)), sample_size, progress))
+
+    i = order.index(a)
+    order = order[i:] + order[:i]
+    if order[1] == b:
+        order = [a] + order[:0:-1]
+
+    return np.array([t for t in order if t != a and t != b])
+
+
+def __nnet_order(mat: np.array, ids: np.array, progress: Callable[[dict], None]) -> np.array:
+    if len(ids) <= 3:
+        return ids
+    cycle = nnet_cycle.compute([""] * len(ids), mat[np.ix_(ids, ids)], progress)
+    return ids[np.array(cycle[1:]) - 1]
+
+
+def __farthest_points(mat: np.array, ids: np.array, k: int) -> np.array:
+    chosen = [int(np.argmax(mat[ids[0], ids]))]
+    min_dist = mat[ids[chosen[0]], ids].copy()
+    min_dist[chosen[0]] = -1.0
+    for i in range(1, k):
+        chosen.append(int(np.argmax(min_dist)))
+        min_dist = np.minimum(min_dist, mat[ids[chosen[-1]], ids])
+        min_dist[chosen[-1]] = -1.0
+    return ids[chosen]
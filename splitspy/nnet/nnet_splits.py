@@ -10,15 +10,23 @@ GPL (http://www.gnu.org/licenses/gpl.html).
 """
 
 import math
+from typing import Callable, Tuple
+
 import numpy as np
+from splitspy import metrics
+from splitspy.nnet.checkpoint import Checkpoint
+from splitspy.progress import Monitor
 from splitspy.splits.basic_split import *
 
 __author__ = "David J. Bryant and Daniel H. Huson"
 
 CG_EPSILON = 0.0001
+BUILD_RESERVE = 0.1  # part of a time budget reserved for building the splits
 
 
-def compute(n_tax: int, mat: np.array, cycle: [int], cutoff=0.00001, constrained=True) -> [Split]:
+def compute(n_tax: int, mat: np.array, cycle: [int], cutoff=0.00001, constrained=True, max_size: int = 0,
+            top_k: int = 0, weights: np.array = None, progress: Callable[[dict], None] = None,
+            budget: float = 0.0, checkpoint: Checkpoint = None) -> [Split]:
     """ compute splits and their weights using ordinary or constrained least squares
         Parameters
         ----------
@@ -32,6 +40,25 @@ def compute(n_tax: int, mat: np.array, cycle: [int], cutoff=0.00001, constrained
                minimum split weight
             constrained: bool
                 constrained or ordinary least squares
+            max_size: int
+                if positive, only splits whose smaller part has at most this many taxa are considered
+            top_k: int
+                if positive, only the top_k splits with largest unconstrained weight are considered
+            weights: np.array
+                per-pair weights for weighted least squares, 0-based, or None for unit weights.
+                Missing distances (NaN) always get weight 0
+            progress: Callable[[dict], None]
+                if given, called after each conjugate gradient iteration (with the residual) and each change
+                of the active set (with its size), may raise progress.Cancelled to stop the computation
+            budget: float
+                if positive, wall-clock time in seconds after which the best solution found so far is returned.
+                A tenth of the budget is reserved for building the splits, heaviest first, and any splits not
+                built in time are dropped. For CLS, if the active set method has not converged in half of the
+                remaining time, the rest is spent on accelerated projected gradients, starting from the active set
+                solution with negative weights set to 0, or from 0, whichever fits better
+            checkpoint: Checkpoint
+                if given, the state of the active set method (CLS) is saved to it periodically and,
+                if it holds such a state, the computation continues from there
         Returns
         -------
             [Split]
@@ -40,238 +67,308 @@ def compute(n_tax: int, mat: np.array, cycle: [int], cutoff=0.00001, constrained
     if n_tax == 1:
         return []
     elif n_tax == 2:
-        return [cyc_split([1, 2], 2, 2, mat[1][2])] if mat[1][2] >= cutoff else []
+        return [cyc_split([0, 1, 2], 2, 2, mat[0][1])] if mat[0][1] >= cutoff else []
 
     d = __setup_d(n_tax, mat, cycle)
-    x = np.empty(int((n_tax*(n_tax-1))/2))
+    w = __setup_w(n_tax, weights, cycle, d)
+    d[np.isnan(d)] = 0.0
+
+    monitor = Monitor(progress, budget)
+
+    columns = __free_columns(n_tax, d, w, max_size, top_k, monitor)
+
+    if budget <= 0:
+        solve_monitor = monitor
+    else:
+        solve_monitor = Monitor(progress, max((1.0 - BUILD_RESERVE) * monitor.remaining(), 0.000001))
 
     if not constrained:
-        __unconstrained_least_squares(n_tax, d, x)
+        x, _ = __least_squares(n_tax, d, w, columns, solve_monitor)
+    elif budget <= 0:
+        x = __active_conjugate(n_tax, d, w, columns, solve_monitor, checkpoint)
     else:
-        __active_conjugate(n_tax, d, x)
+        active_monitor = Monitor(progress, max(0.5 * solve_monitor.remaining(), 0.000001))
+        x = __active_conjugate(n_tax, d, w, columns, active_monitor, checkpoint)
+        if active_monitor.exceeded():
+            x = __projected_gradient(n_tax, d, w, columns, np.maximum(x, 0.0),
+                                     Monitor(progress, max(solve_monitor.remaining(), 0.000001)))
 
-    splits = []
+    return __build_splits(n_tax, cycle, x, columns, cutoff, monitor if budget > 0 else None)
 
-    index = 0
-    for i in range(1, n_tax + 1):
-        for j in range(i + 1, n_tax + 1):
-            if x[index] > cutoff:
-                splits.append(cyc_split(cycle, i + 1, j, x[index]))
-            index += 1
 
-    return splits
+def __build_splits(n_tax: int, cycle: [int], x: np.array, columns: np.array, cutoff: float,
+                   monitor: Monitor = None) -> [Split]:
+    """ builds the splits whose weight exceeds the cutoff. If a monitor is given, the splits are built by decreasing
+        weight and, once its budget is used up, the remaining (lightest) splits are dropped
+    """
+    cycle = tuple(cycle)  # shared by the splits as the snapshot of their cached intervals
+    rows, cols = np.triu_indices(n_tax, 1)
+    if columns is not None:
+        rows, cols = rows[columns], cols[columns]
+    indices = np.flatnonzero(x > cutoff)
+
+    if monitor is None:
+        return [cyc_split(cycle, rows[index] + 2, cols[index] + 1, x[index]) for index in indices]
+
+    built = []
+    for index in indices[np.argsort(-x[indices], kind="stable")]:
+        if monitor.exceeded():
+            break
+        built.append((index, cyc_split(cycle, rows[index] + 2, cols[index] + 1, x[index])))
+
+    if len(built) < len(indices):
+        metrics.count("splits_dropped", len(indices) - len(built))
+    built.sort(key=lambda pair: pair[0])
+    return [split for index, split in built]
 
 
 def __setup_d(n: int, mat: np.array, cycle: [int]) -> np.array:
-    d = np.empty(int((n*(n-1))/2))
-
-    index = 0
-    for i in range(1, n + 1):
-        for j in range(i + 1, n + 1):
-            d[index] = mat[cycle[i] - 1][cycle[j] - 1]
-            index += 1
-    return d
-
-
-def __unconstrained_least_squares(n_tax: int, d: np.array, x: np.array) -> None:
-
-    index = 0
-    for i in range(0, n_tax - 3 + 1):
-        x[index] = (d[index] + d[index + (n_tax - i - 2) + 1] - d[index + 1]) / 2.0
-        index += 1
-        for j in range(i + 2, n_tax - 2 + 1):
-            x[index] = (d[index] + d[index + (n_tax - i - 2) + 1] - d[index + 1] - d[index + (n_tax - i - 2)]) / 2.0
-            index += 1
-        if i == 0:
-            x[index] = (d[0] + d[n_tax - 2] - d[2 * n_tax - 4]) / 2.0
-        else:
-            x[index] = (d[index] + d[i] - d[i - 1] - d[index + (n_tax - i - 2)]) / 2.0
-        index += 1
-    x[index] = (d[index] + d[n_tax - 2] - d[n_tax - 3]) / 2.0
+    order = np.array(cycle[1:n + 1]) - 1
+    rows, cols = np.triu_indices(n, 1)
+    return np.asarray(mat, dtype=float)[order[rows], order[cols]]
+
+
+def __setup_w(n: int, weights: np.array, cycle: [int], d: np.array) -> np.array:
+    """ sets up the weight of each pair in the order of d, or None, if all weights are 1
+    """
+    if weights is None and not np.isnan(d).any():
+        return None
+
+    w = np.ones(len(d)) if weights is None else __setup_d(n, weights, cycle)
+    w[np.isnan(d) | np.isnan(w)] = 0.0
+    return w
+
+
+def __free_columns(n_tax: int, d: np.array, w: np.array, max_size: int, top_k: int,
+                   monitor: Monitor = None) -> np.array:
+    """ determines which splits are considered in the solve, all other splits get weight 0. The solvers only
+        hold weights for the considered splits
+        Returns
+        -------
+            np.array
+                indices of the considered circular splits in increasing order, or None, if all splits are considered
+    """
+    columns = np.arange(len(d))
+
+    if max_size > 0:
+        rows, cols = np.triu_indices(n_tax, 1)
+        length = cols - rows
+        columns = np.flatnonzero(np.minimum(length, n_tax - length) <= max_size)
 
+    if 0 < top_k < len(columns):
+        x, _ = __least_squares(n_tax, d, w, columns if len(columns) < len(d) else None, monitor)
+        columns = np.sort(columns[np.argsort(-x, kind="stable")[:top_k]])
 
-def __active_conjugate(n_tax: int, d: np.array, x: np.array) -> None:
+    return columns if len(columns) < len(d) else None
 
-    __unconstrained_least_squares(n_tax, d, x)
 
-    if all(a >= 0 for a in x):
-        return x
+def __unconstrained_least_squares(n_tax: int, d: np.array) -> np.array:
+    dist = __to_matrix(n_tax, d)
+    dist += dist.T
 
-    n_pairs = len(d)
+    rows, cols = np.triu_indices(n_tax, 1)
+    rows1 = rows + 1
+    cols1 = (cols + 1) % n_tax
 
-    active = np.zeros(n_pairs, dtype=np.int32)
+    return (dist[rows, cols] + dist[rows1, cols1] - dist[rows, cols1] - dist[rows1, cols]) / 2.0
 
-    y = np.empty(n_pairs)
-    w = np.ones(n_pairs)
 
-    for k in range(0, n_pairs):
-        y[k] = w[k] * d[k]
+def __least_squares(n_tax: int, d: np.array, w: np.array = None, columns: np.array = None,
+                    monitor: Monitor = None) -> Tuple[np.array, int]:
+    """ solves the (weighted) least squares problem for the splits of the given columns (all, if None), using the
+        closed form solution, if all weights are 1 and all splits are considered, and conjugate gradients, otherwise.
+        Returns the weights of the splits of the given columns and the number of conjugate gradient iterations
+    """
+    if w is None and columns is None:
+        return __unconstrained_least_squares(n_tax, d), 0
 
-    at_wd = np.empty(n_pairs)
-    __calculate_Atx(n_tax, y, at_wd)
+    if w is None:
+        w = np.ones(len(d))
+    n_vars = len(d) if columns is None else len(columns)
 
-    old_x = np.ones(n_pairs)
+    x = np.zeros(n_vars)
+    k = __circular_conjugate_grads(n_tax, w, __apply_At(n_tax, w * d, columns), np.zeros(n_vars, dtype=bool), x,
+                                   columns, monitor)
+    return x, k
 
-    first_pass = True
 
-    r = np.empty(n_pairs)
-    y = np.empty(n_pairs)
+def __active_conjugate(n_tax: int, d: np.array, w: np.array, columns: np.array, monitor: Monitor,
+                       checkpoint: Checkpoint = None) -> np.array:
+    """ solves the non-negative least squares problem using an active set method. If the budget of the monitor is
+        used up, returns the current (infeasible) solution. The numbers of conjugate gradient iterations and of
+        changes of the active set are saved with the checkpoint, so that they continue when a run is resumed
+    """
+    n_vars = len(d) if columns is None else len(columns)
+
+    if checkpoint is not None and checkpoint.get("x") is not None:
+        x = checkpoint.get("x").copy()
+        old_x = checkpoint.get("old_x").copy()
+        active = np.unpackbits(checkpoint.get("active"), count=n_vars).astype(bool)
+        first_pass = bool(checkpoint.get("first_pass"))
+        cg_iterations = int(checkpoint.get("cg_iterations") or 0)
+        active_set_changes = int(checkpoint.get("active_set_changes") or 0)
+        metrics.value("resumed", True)
+        metrics.count("cg_iterations", cg_iterations)
+        metrics.count("active_set_changes", active_set_changes)
+    else:
+        x, cg_iterations = __least_squares(n_tax, d, w, columns, monitor)
+        if np.all(x >= 0):
+            return x
+        active = np.zeros(n_vars, dtype=bool)
+        old_x = np.ones(n_vars)
+        first_pass = True
+        active_set_changes = 0
+
+    if w is None:
+        w = np.ones(len(d))
+
+    at_wd = __apply_At(n_tax, w * d, columns)
 
     while True:
-        while True:
+        while not monitor.exceeded():
+            if checkpoint is not None and checkpoint.due():
+                checkpoint.save(x=x, old_x=old_x, active=np.packbits(active), first_pass=first_pass,
+                                cg_iterations=cg_iterations, active_set_changes=active_set_changes)
+
             if first_pass:
                 first_pass = False
             else:
-                __circular_conjugate_grads(n_tax, n_pairs, w, at_wd, active, x, r, y)
+                cg_iterations += __circular_conjugate_grads(n_tax, w, at_wd, active, x, columns, monitor)
 
             to_contract = __worst_indices(x, 0.6)
             if len(to_contract) > 0:
-                for index in to_contract:
-                    x[index] = 0.0
-                    active[index] = 1
-                __circular_conjugate_grads(n_tax, n_pairs, w, at_wd, active, x, r, y)
-
-            min_i = -1
-            min_xi = -1.0
-            for i in range(0, n_pairs):
-                if x[i] < 0.0:
-                    xi = (old_x[i]) / (old_x[i] - x[i])
-                    if min_i == -1 or xi < min_xi:
-                        min_i = i
-                        min_xi = xi
-            if min_i == -1:
+                x[to_contract] = 0.0
+                active[to_contract] = True
+                active_set_changes += len(to_contract)
+                metrics.count("active_set_changes", len(to_contract))
+                cg_iterations += __circular_conjugate_grads(n_tax, w, at_wd, active, x, columns, monitor)
+
+            negative = np.flatnonzero(x < 0.0)
+            if len(negative) == 0:
                 break
             else:
-                for i in range(0, n_pairs):
-                    if active[i] == 0:
-                        old_x[i] += min_xi * (x[i] - old_x[i])
-                active[min_i] = 1
+                ratios = old_x[negative] / (old_x[negative] - x[negative])
+                min_i = negative[np.argmin(ratios)]
+                min_xi = ratios.min()
+                free = ~active
+                old_x[free] += min_xi * (x[free] - old_x[free])
+                active[min_i] = True
                 x[min_i] = 0.0
+                active_set_changes += 1
+                metrics.count("active_set_changes")
 
-        __calculate_AB(n_tax, x, y)
-        for i in range(0, n_pairs):
-            y[i] *= w[i]
-        __calculate_Atx(n_tax, y, r)
+            monitor.report({"stage": "nnet_splits", "active": int(np.count_nonzero(active))})
 
-        min_i = -1
-        min_grad = 1.0
+        if monitor.exceeded():
+            break
 
-        for i in range(0, n_pairs):
-            r[i] -= at_wd[i]
-            r[i] *= 2.0
-            if active[i] == 1:
-                grad_ij = r[i]
-                if min_i == -1 or grad_ij < min_grad:
-                    min_i = i
-                    min_grad = grad_ij
+        r = 2.0 * (__apply_At(n_tax, w * __apply_A(n_tax, x, columns), columns) - at_wd)
 
-        if min_i == -1 or min_grad > -0.0001:
+        candidates = np.flatnonzero(active)
+        if len(candidates) == 0:
             break
-        else:
-            active[min_i] = 0
 
+        min_i = candidates[np.argmin(r[candidates])]
+
+        if r[min_i] > -0.0001:
+            break
+        else:
+            active[min_i] = False
+            active_set_changes += 1
+            metrics.count("active_set_changes")
 
-def __calculate_Atx(n: int, d: np.array, r: np.array) -> None:
+    return x
 
-    index = 0
-    for i in range(0, n - 1):
-        r[index] = __row_sum(n, d, i + 1)
-        index += (n - i - 1)
 
-    index = 1
-    for i in range(0, n - 2):
-        r[index] = r[index - 1] + r[index + (n - i - 2)] - 2 * d[index + (n - i - 2)]
-        index += (n - i - 2) + 1
+def __projected_gradient(n_tax: int, d: np.array, w: np.array, columns: np.array, x_0: np.array,
+                         monitor: Monitor) -> np.array:
+    """ solves the non-negative least squares problem using accelerated projected gradients (FISTA), starting
+        from the feasible solution x_0, or from 0, if that fits better, until converged or the budget of the monitor
+        is used up. Returns the better of the starting point and the last iterate
+    """
+    if w is None:
+        w = np.ones(len(d))
+    if __loss(n_tax, d, w, x_0, columns) > w @ (d * d):
+        x_0 = np.zeros(len(x_0))
+
+    v = np.ones(len(x_0))
+    step = 1.0
+    for k in range(0, 20):  # power iteration for the largest eigenvalue of A'WA
+        if monitor.exceeded():
+            return x_0
+        v = __apply_At(n_tax, w * __apply_A(n_tax, v, columns), columns)
+        step = 1.0 / (1.01 * np.linalg.norm(v))
+        v *= step * 1.01
+
+    b = __apply_At(n_tax, w * d, columns)
+    e_0 = CG_EPSILON * math.sqrt(b @ b)
+
+    x = x_0
+    y = x
+    t = 1.0
+    k = 0
+    while True:
+        k = k + 1
+        g = __apply_At(n_tax, w * __apply_A(n_tax, y, columns), columns) - b
+        x_new = np.maximum(y - step * g, 0.0)
 
-    for k in range(3, n):
-        index = k - 1
-        for i in range(0, n - k):
-            r[index] = r[index - 1] + r[index + n - i - 2] - r[index + n - i - 3] - 2.0 * d[index + n - i - 2]
-            index += (n - i - 2) + 1
+        t_new = (1.0 + math.sqrt(1.0 + 4.0 * t * t)) / 2.0
+        y = x_new + ((t - 1.0) / t_new) * (x_new - x)
 
+        residual = float(np.linalg.norm(x_new - x)) / step
+        x, t = x_new, t_new
 
-def __row_sum(n: int, d: np.array, k: int) -> float:
-    r = 0
-    index = 0
+        if monitor.report({"stage": "nnet_splits", "pg_iterations": k, "residual": residual}) or residual < e_0:
+            break
 
-    if k > 0:
-        index = k - 1
-        for i in range(0, k):
-            r += d[index]
-            index += (n - i - 2)
-        index += 1
+    metrics.count("pg_iterations", k)
+    return x if __loss(n_tax, d, w, x, columns) <= __loss(n_tax, d, w, x_0, columns) else x_0
 
-    for j in range(k + 1, n):
-        r += d[index]
-        index += 1
 
-    return r
+def __loss(n_tax: int, d: np.array, w: np.array, x: np.array, columns: np.array) -> float:
+    """ the weighted sum of squares of the differences between d and the distances induced by x
+    """
+    r = __apply_A(n_tax, x, columns) - d
+    return float(w @ (r * r))
 
 
-def __worst_indices(x: np.array, prop_kept: float) -> [int]:
+def __worst_indices(x: np.array, prop_kept: float) -> np.array:
     if prop_kept == 0.0:
         return []
 
     prop_kept = 0.1
 
-    n_pairs = len(x)
-
-    x_cpy = []
-    for value in x:
-        if value < 0:
-            x_cpy.append(value)
-    n_neg = len(x_cpy)
+    negative = np.sort(x[x < 0])
+    n_neg = len(negative)
 
     if n_neg == 0:
         return []
 
-    x_cpy.sort()
-
     n_kept = math.ceil(prop_kept * n_neg)
-    cutoff = x_cpy[n_kept - 1]
-
-    front = 0
-    back = n_kept - 1
+    cutoff = negative[n_kept - 1]
 
-    worst = [0] * n_kept
+    below = np.flatnonzero(x < cutoff)
+    at = np.flatnonzero(x == cutoff)
 
-    for i in range(0, n_pairs):
-        if x[i] < cutoff:
-            worst[front] = i
-            front += 1
-        elif x[i] == cutoff:
-            if back >= front:
-                worst[back] = i
-                back -= 1
+    return np.concatenate((below, at[:n_kept - len(below)]))
 
-    return worst
 
-
-def __circular_conjugate_grads(n_tax: int, n_pairs: int, W: np.array, b: np.array, active: np.array, x: np.array,
-                               r: np.array, y: np.array) -> None:
+def __circular_conjugate_grads(n_tax: int, W: np.array, b: np.array, active: np.array, x: np.array,
+                               columns: np.array = None, monitor: Monitor = None) -> int:
+    """ solves the least squares problem restricted to the splits that are not active, starting from x, which is
+        updated in place. Returns the number of iterations
+    """
     k_max = n_tax * (n_tax - 1) / 2
 
-    __calculate_AB(n_tax, x, y)
-
-    for k in range(0, n_pairs):
-        y[k] = W[k] * y[k]
-
-    __calculate_Atx(n_tax, y, r)
+    r = b - __apply_At(n_tax, W * __apply_A(n_tax, x, columns), columns)
+    r[active] = 0.0
 
-    for k in range(0, n_pairs):
-        if active[k] == 0:
-            r[k] = b[k] - r[k]
-        else:
-            r[k] = 0.0
-
-    rho = __norm(r)
+    rho = r @ r
     rho_old = 0
 
-    e_0 = CG_EPSILON * math.sqrt(__norm(b))
+    e_0 = CG_EPSILON * math.sqrt(b @ b)
     k = 0
 
-    u = np.empty(n_pairs)
-
     p = np.array(0)
     while rho > e_0 * e_0 and k < k_max:
         k = k + 1
@@ -279,64 +376,78 @@ def __circular_conjugate_grads(n_tax: int, n_pairs: int, W: np.array, b: np.arra
             p = r.copy()
         else:
             beta = rho / rho_old
-            for i in range(0, n_pairs):
-                p[i] = r[i] + beta * p[i]
+            p = r + beta * p
+
+        u = __apply_At(n_tax, W * __apply_A(n_tax, p, columns), columns)
+        u[active] = 0.0
 
-        __calculate_AB(n_tax, p, y)
+        alpha = rho / (p @ u)
 
-        for i in range(0, n_pairs):
-            y[i] *= W[i]
+        x += alpha * p
+        r -= alpha * u
 
-        __calculate_Atx(n_tax, y, u)
+        rho_old = rho
+        rho = r @ r
+
+        if monitor is not None and monitor.report({"stage": "nnet_splits", "cg_iterations": k,
+                                                   "residual": math.sqrt(rho)}):
+            break
 
-        for i in range(0, n_pairs):
-            if active[i] == 1:
-                u[i] = 0.0
+    metrics.count("cg_iterations", k)
+    return k
 
-        alpha = 0.0
-        for i in range(0, n_pairs):
-            alpha += p[i] * u[i]
 
-        alpha = rho / alpha
+def __to_matrix(n: int, v: np.array) -> np.array:
+    m = np.zeros((n, n))
+    m[np.triu_indices(n, 1)] = v
+    return m
 
-        for i in range(0, n_pairs):
-            x[i] += alpha * p[i]
-            r[i] -= alpha * u[i]
 
-        rho_old = rho
-        rho = __norm(r)
-
-
-def __calculate_AB(n: int, b: np.array, d: np.array) -> None:
-    d_index = 0
-    for i in range(0, n - 1):
-        d_ij = 0.0
-        index = i - 1
-        for k in range(0, i):
-            d_ij += b[index]
-            index += n - k - 2
-        index += 1
-        for k in range(i + 1, n):
-            d_ij += b[index]
-            index += 1
-
-        d[d_index] = d_ij
-        d_index += (n - i - 2) + 1
-
-    index = 1
-    for i in range(0, n - 2):
-        d[index] = d[index - 1] + d[index + (n - i - 2)] - 2 * b[index - 1]
-        index += 1 + (n - i - 2)
-
-    for k in range(3, n):
-        index = k - 1
-        for i in range(0, n - k):
-            d[index] = d[index - 1] + d[index + (n - i - 2)] - d[index + (n - i - 2) - 1] - 2.0 * b[index - 1]
-            index += 1 + (n - i - 2)
-
-
-def __norm(x: np.array) -> float:
-    n = 0.0
-    for value in x:
-        n += value * value
-    return n
+def __apply_A(n: int, x: np.array, columns: np.array) -> np.array:
+    """ computes the distances d=Ax induced by the weights x of the splits of the given columns (all, if None)
+    """
+    if columns is None:
+        return __calculate_AB(n, x)
+    b = np.zeros(n * (n - 1) // 2)
+    b[columns] = x
+    return __calculate_AB(n, b)
+
+
+def __apply_At(n: int, d: np.array, columns: np.array) -> np.array:
+    """ computes r=A'd for the splits of the given columns (all, if None)
+    """
+    r = __calculate_Atx(n, d)
+    return r if columns is None else r[columns]
+
+
+def __calculate_AB(n: int, b: np.array) -> np.array:
+    """ computes the distances d=Ab induced by circular split weights b
+
+        The split with index (a,c) separates the cycle positions a+1..c from the rest,
+        so d(p,q) sums the weights with a < p <= c < q or p <= a < q <= c.
+    """
+    m = __to_matrix(n, b)
+    rows, cols = np.triu_indices(n, 1)
+
+    left = np.zeros((n, n + 1))
+    np.cumsum(np.cumsum(m, axis=0)[:-1], axis=1, out=left[1:, 1:])
+
+    right = np.zeros((n + 1, n))
+    np.cumsum(np.cumsum(m[:, ::-1], axis=1)[:, ::-1], axis=0, out=right[1:])
+
+    return (left[rows, cols] - left[rows, rows]) + (right[cols, cols] - right[rows, cols])
+
+
+def __calculate_Atx(n: int, d: np.array) -> np.array:
+    """ computes r=A'd, i.e. for each circular split, the sum of the entries of d over all pairs it separates
+    """
+    m = __to_matrix(n, d)
+    rows, cols = np.triu_indices(n, 1)
+
+    outer = np.zeros((n + 1, n))
+    np.cumsum(np.cumsum(m[:, :0:-1], axis=1)[:, ::-1], axis=0, out=outer[1:, :-1])
+
+    inner = np.zeros((n, n + 1))
+    np.cumsum(np.cumsum(m, axis=0), axis=1, out=inner[:, 1:])
+
+    return (outer[cols + 1, cols] - outer[rows + 1, cols]) + (inner[rows, cols + 1] - inner[rows, rows + 1])
@@ -7,28 +7,42 @@ See: Bryant and Huson, 2021
 LICENSE: This is open-source software released under the terms of the
 GPL (http://www.gnu.org/licenses/gpl.html).
 """
-from typing import List
+import math
+import sys
+from typing import List, Callable
 
 from scipy.optimize import linprog
 import numpy as np
+from splitspy import metrics
+from splitspy.progress import Monitor
 from splitspy.splits.basic_split import *
 
 
 __author__ = "Daniel H. Huson"
 
+LP_SHARE = 0.75  # part of the budget given to setting up and solving the LP, the rest is kept for the CLS fallback
 
-def compute(n_tax: int, mat: np.array, cycle: [int], cutoff=0.00001) -> [Split]:
+
+def compute(n_tax: int, mat: np.array, cycle: [int], cutoff=0.00001, progress: Callable[[dict], None] = None,
+            budget: float = 0.0) -> [Split]:
     """ compute splits and their weights using Linear Program
         Parameters
         ----------
             n_tax: int
                 number of taxa
             mat: np.array
-                distance matrix, 0-based
+                distance matrix, 0-based, missing distances (NaN) are ignored
             cycle: [int]
                 circular ordering, 1-based
             cutoff: float
                 minimum split weight
+            progress: Callable[[dict], None]
+                if given, called after each row of constraints has been set up, may raise progress.Cancelled
+                to stop the computation
+            budget: float
+                if positive, wall-clock time in seconds after which the best solution found so far is returned.
+                Setting up and solving the LP gets three quarters of the budget. If no solution is found in that
+                time, CLS is run for the rest of the budget instead
         Returns
         -------
             [Split]
@@ -38,7 +52,10 @@ def compute(n_tax: int, mat: np.array, cycle: [int], cutoff=0.00001) -> [Split]:
     if n_tax == 1:
         return []
     elif n_tax == 2:
-        return [cyc_split([1, 2], 2, 2, mat[0][1])] if mat[0][1] >= cutoff else []
+        return [cyc_split([0, 1, 2], 2, 2, mat[0][1])] if mat[0][1] >= cutoff else []
+
+    monitor = Monitor(progress, budget)
+    lp_monitor = Monitor(progress, LP_SHARE * budget)
 
     all = __all_splits(cycle)
 
@@ -46,6 +63,8 @@ def compute(n_tax: int, mat: np.array, cycle: [int], cutoff=0.00001) -> [Split]:
     split_counts = np.zeros(len(all),dtype=np.int32)
     for i in range(0, n_tax):
         for j in range(i + 1, n_tax):
+            if math.isnan(mat[i][j]):
+                continue
             total += mat[i][j]
             for s in range(0, len(all)):
                 split = all[s]
@@ -62,6 +81,8 @@ def compute(n_tax: int, mat: np.array, cycle: [int], cutoff=0.00001) -> [Split]:
 
     for i in range(0, n_tax):
         for j in range(i + 1, n_tax):
+            if math.isnan(mat[i][j]):
+                continue
             row = []
             for s in range(0, len(all)):
                 split = all[s]
@@ -71,8 +92,26 @@ def compute(n_tax: int, mat: np.array, cycle: [int], cutoff=0.00001) -> [Split]:
                     row.append(0)
             A.append(row)
             b.append(mat[i][j])
-
-    res = linprog(c, A_ub=A, b_ub=b)
+        if lp_monitor.report({"stage": "nnet_splits_lp", "rows": i + 1}):
+            break
+
+    if lp_monitor.exceeded():
+        res = None
+        message = "time limit reached while setting up constraints"
+    else:
+        options = {} if lp_monitor.remaining() is None else {"time_limit": max(lp_monitor.remaining(), 0.001)}
+        res = linprog(c, A_ub=A, b_ub=b, options=options)
+        message = res.message.strip()
+
+    if res is None or res.x is None:  # stopped before a solution was found, fall back to CLS for the rest of the budget
+        metrics.value("lp_status", -1 if res is None else res.status)
+        warning = f"LP stopped before finding a solution ({message}), using CLS weights instead"
+        metrics.value("warning", warning)
+        print("Warning:", warning, file=sys.stderr)
+        from splitspy.nnet import nnet_splits
+        remaining = monitor.remaining()
+        return nnet_splits.compute(n_tax, mat, cycle, cutoff, True, progress=progress,
+                                   budget=0.0 if remaining is None else max(remaining, 0.000001))
 
     result = []
     for s in range(0, len(all)):
@@ -82,12 +121,13 @@ def compute(n_tax: int, mat: np.array, cycle: [int], cutoff=0.00001) -> [Split]:
             split = Split(src.part1(),src.part2(),res.x[s])
             result.append(split)
 
-    print(f"Delta: {total+res.fun:0.4f}")
+    metrics.value("lp_delta", total + res.fun)
 
     return result
 
 
 def __all_splits(cycle: List[int]) -> List[Split]:
+    cycle = tuple(cycle)
     splits = []
 
     for p in range(2, len(cycle)):
@@ -2,7 +2,8 @@
 """Program that computes a phylogenetic outline for a distance matrix, using neighbor-net
 
 Given a distance matrix on a set of taxa, this program runs the neighbor-net algorithm
-and then computes a phylogenetic outline. The outline is drawn in a graphics window
+and then computes a phylogenetic outline. The outline is drawn in a graphics window.
+Alternatively, the splits are read from a nexus or binary splits file and neighbor-net is skipped
 
 See: Bryant and Moulton (2004)
 See: Huson et al (2021)
@@ -11,15 +12,19 @@ See: Huson et al (2021)
 LICENSE: This is open-source software released under the terms of the
 GPL (http://www.gnu.org/licenses/gpl.html).
 """
-from typing import Set
+import os
+import sys
+from typing import Set, Tuple, List
 
+from splitspy import fileio, metrics
 import splitspy.nnet.distances as distances
 import splitspy.nnet.nnet_algo as nnet_algorithm
-from splitspy.graph import draw
 from splitspy.splits import splits_io
 import splitspy.outlines.outline_algo
 from optparse import OptionParser, OptionGroup
-from splitspy.splits.basic_split import split_dist
+from splitspy.splits.basic_split import split_dist, Split
+from splitspy.splits.circular_splits import CircularSplits
+from splitspy.nnet.checkpoint import Checkpoint
 
 __author__ = "Daniel H. Huson"
 
@@ -30,6 +35,8 @@ def main():
     Usage:
     -----
     python splitspy.outline.py [options] infile
+    python splitspy.outline.py --splits FILE [options] [infile]
+    python splitspy.outline.py serve [serve options]   (see splitspy.serve)
 
     Options:
     -------
@@ -39,10 +46,34 @@ def main():
         -n FILE, --nexus=FILE
                             output splits file (Nexus format for SplitsTree5)
         -t FILE, --tgf=FILE output graph file (in trivial graph format)
+        -b FILE, --binary=FILE
+                            output splits file (binary format, for fast loading with --splits)
+        --metrics=FILE      output timings, peak memory and counters per stage (JSON format)
+        --trace_memory      with --metrics, also trace the peak memory of each stage using tracemalloc
+                            (slows down the computation, so timings are inflated)
+        --batch             process a stream of concatenated matrices, numbering the output files
+                            (out.png becomes out-1.png, out-2.png, ...)
+        -s FILE, --splits=FILE
+                            read the cycle and splits from a nexus or binary splits file instead of running
+                            neighbor-net, the input matrix, if given, is only used to compute the fit
 
         Neighbor-net Options:
         -m, --mode          compute splits weights using OLS (ordinary least squares), CLS (constrained least squares
                             or LP (linear programming)
+        --cycle_method=METHOD
+                            compute the circular ordering using NNET (neighbor-net) or FAST (approximate,
+                            for very large numbers of taxa)
+        --max_size=SIZE     only consider splits whose smaller part has at most SIZE taxa (OLS and CLS)
+        --top_k=K           only consider the K splits with largest unconstrained weight (OLS and CLS)
+        -w WEIGHTS, --weights=WEIGHTS
+                            weighted least squares using FM (Fitch-Margoliash weights 1/d^2) or weights 1/v
+                            for a matrix of variances v read from the named file (OLS and CLS)
+        --budget=SECONDS    stop computing split weights after this many seconds (in total) and use the best
+                            weights found so far
+        --checkpoint=FILE   periodically save the cycle and the state of the CLS computation to this file
+        --checkpoint_interval=SECONDS
+                            minimum time between two checkpoints
+        --resume            continue from the checkpoint file, if it exists
 
         Outline Options:
         -r, --rooted        rooted network
@@ -79,6 +110,11 @@ def main():
     Phylogenetic outlines and the outline algorithm are due to David Bryant and Daniel Huson, and were implemented
     by Daniel Huson in Java and Python (Huson et al, 2021).
 """
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from splitspy import serve
+        serve.main(sys.argv[2:])
+        return
+
     parser = OptionParser("%prog [options] infile",
                           description="Run neighbor-net and compute a phylogenetic outline",
                           epilog="Please cite: Huson et al (2021) and Bryant and Moulton (2004).")
@@ -92,12 +128,55 @@ def main():
     parser.add_option("-t", "--tgf", default="", action="store", dest="graph_file",
                       help="output graph file (in trivial graph format)",  metavar="FILE")
 
+    parser.add_option("-b", "--binary", default="", action="store", dest="binary_file",
+                      help="output splits file (binary format, for fast loading with --splits)", metavar="FILE")
+
+    parser.add_option("--metrics", default="", action="store", dest="metrics_file",
+                      help="output timings, peak memory and counters per stage (JSON format)", metavar="FILE")
+
+    parser.add_option("--trace_memory", default=False, action="store_true", dest="trace_memory",
+                      help="with --metrics, also trace the peak memory of each stage using tracemalloc "
+                           "(slows down the computation, so timings are inflated)")
+
+    parser.add_option("--batch", default=False, action="store_true", dest="batch",
+                      help="process a stream of concatenated matrices, numbering the output files "
+                           "(out.png becomes out-1.png, out-2.png, ...)")
+
+    parser.add_option("-s", "--splits", default="", action="store", dest="splits_file",
+                      help="read the cycle and splits from a nexus or binary splits file instead of running "
+                           "neighbor-net, the input matrix, if given, is only used to compute the fit",
+                      metavar="FILE")
+
     nnet_opts = OptionGroup(parser, "Neighbor-net Options")
     nnet_opts.add_option("-m", "--mode", default="CLS", action="store", dest="mode", type="str",
                          help="compute splits weights using OLS (ordinary least squares), "
                               "CLS (constrained least squares or LP (linear programming)")
     nnet_opts.add_option("-c", "--cutoff", default=0.0000001, action="store", dest="cutoff", type="float",
                          help="Minimum split weight cutoff")
+    nnet_opts.add_option("--cycle_method", "--cycle-method", default="NNET", action="store", dest="cycle_method",
+                         type="str", help="compute the circular ordering using NNET (neighbor-net) or FAST "
+                                          "(approximate, for very large numbers of taxa)", metavar="METHOD")
+    nnet_opts.add_option("--max_size", default=0, action="store", dest="max_size", type="int",
+                         help="only consider splits whose smaller part has at most SIZE taxa (OLS and CLS)",
+                         metavar="SIZE")
+    nnet_opts.add_option("--top_k", default=0, action="store", dest="top_k", type="int",
+                         help="only consider the K splits with largest unconstrained weight (OLS and CLS)",
+                         metavar="K")
+    nnet_opts.add_option("-w", "--weights", default="", action="store", dest="weights", type="str",
+                         help="weighted least squares using FM (Fitch-Margoliash weights 1/d^2) or weights 1/v "
+                              "for a matrix of variances v read from the named file (OLS and CLS)")
+    nnet_opts.add_option("--budget", default=0.0, action="store", dest="budget", type="float",
+                         help="stop computing split weights after this many seconds (in total) and use the best "
+                              "weights found so far", metavar="SECONDS")
+    nnet_opts.add_option("--checkpoint", default="", action="store", dest="checkpoint_file",
+                         help="periodically save the cycle and the state of the CLS computation to this file",
+                         metavar="FILE")
+    nnet_opts.add_option("--checkpoint_interval", default=600.0, action="store", dest="checkpoint_interval",
+                         type="float", help="minimum time between two checkpoints", metavar="SECONDS")
+    nnet_opts.add_option("--resume", default=False, action="store_true", dest="resume",
+                         help="continue from the checkpoint file, if it exists")
+
+    parser.add_option_group(nnet_opts)
 
     outline_opts = OptionGroup(parser, "Outline Options")
     outline_opts.add_option("-r", "--rooted", default=False, action="store_true", dest="rooted", help="rooted network")
@@ -132,6 +211,8 @@ def main():
 
     if len(args) == 1:
         infile = args[0]
+    elif len(args) == 0 and options.splits_file != "":
+        infile = ""
     elif len(args) == 0:
         raise IOError("Must specify exactly one input file (use - for stdin)")
     else:
@@ -140,45 +221,212 @@ def main():
     if options.mode != "CLS" and options.mode != "OLS" and options.mode != "LP":
         raise IOError("Unknown --mode: ", options.mode)
 
-    labels, matrix = distances.read(infile)
-
+    if options.cycle_method != "NNET" and options.cycle_method != "FAST":
+        raise IOError("Unknown --cycle_method: ", options.cycle_method)
+
+    if options.resume and options.checkpoint_file == "":
+        raise IOError("--resume requires --checkpoint")
+
+    if options.batch and options.checkpoint_file != "":
+        raise IOError("--checkpoint cannot be used with --batch")
+
+    if options.splits_file != "" and options.batch:
+        raise IOError("--splits cannot be used with --batch")
+
+    recorder = metrics.Metrics(trace_memory=options.trace_memory) if options.metrics_file != "" else None
+    try:
+        with metrics.recording(recorder):
+            if options.splits_file != "":
+                redraw(options.splits_file, infile, options)
+                return
+
+            if options.batch:
+                # each matrix is parsed in the background, the time taken is recorded as its read stage
+                matrices = fileio.prefetch(metrics.timed(distances.read_all(infile)))
+            else:
+                with metrics.stage("read"):
+                    matrices = [(distances.read(infile), None, None)]
+
+            for k, ((labels, matrix), wall_time, cpu_time) in enumerate(matrices, 1):
+                if wall_time is not None:
+                    metrics.add("read", wall_time, cpu_time)
+                weights = read_weights(options.weights, labels, matrix)
+
+                out_grp = out_group(labels, options.out_grp_labels)
+
+                checkpoint = None
+                if options.checkpoint_file != "":
+                    checkpoint = Checkpoint(options.checkpoint_file, options.checkpoint_interval, options.resume)
+
+                outfile, nexus_file, graph_file, binary_file = options.outfile, options.nexus_file, \
+                    options.graph_file, options.binary_file
+                if options.batch:
+                    outfile, nexus_file, graph_file, binary_file = [batch_file(f, k) for f in
+                                                                    (outfile, nexus_file, graph_file, binary_file)]
+
+                run(labels, matrix, outfile=outfile, nexus_file=nexus_file, graph_file=graph_file,
+                    mode=options.mode, cutoff=options.cutoff, cycle_method=options.cycle_method,
+                    max_size=options.max_size, top_k=options.top_k, weights=weights, budget=options.budget,
+                    checkpoint=checkpoint,
+                    rooted=options.rooted, alt=options.alt,
+                    out_grp=out_grp, win_width=options.win_width, win_height=options.win_height,
+                    m_left=options.m_left, m_right=options.m_right, m_top=options.m_top, m_bot=options.m_bot,
+                    font_size=options.font_size, show=not options.batch, binary_file=binary_file)
+    finally:
+        if recorder is not None:
+            recorder.write(options.metrics_file)
+
+
+def redraw(splits_file: str, infile: str, options) -> float:
+    """ reads the splits from a nexus or binary splits file and computes and draws their outline, skipping
+        neighbor-net. The fit is computed from the matrix in infile, if given, otherwise the fit given in the file
+        is used
+    """
+    with metrics.stage("read_splits"):
+        labels, splits = splits_io.read_splits(splits_file)
+
+    matrix = None
+    if infile != "":
+        with metrics.stage("read"):
+            mat_labels, matrix = distances.read(infile)
+        order = taxon_order(labels, mat_labels, infile)
+        if order is None:
+            raise IOError("Taxa of distance matrix differ from taxa of splits:", infile)
+        matrix = [[matrix[i][j] for j in order] for i in order]
+
+    return render(labels, matrix, splits.cycle, splits, outfile=options.outfile, nexus_file=options.nexus_file,
+                  graph_file=options.graph_file, rooted=options.rooted, alt=options.alt,
+                  out_grp=out_group(labels, options.out_grp_labels), win_width=options.win_width,
+                  win_height=options.win_height, m_left=options.m_left, m_right=options.m_right,
+                  m_top=options.m_top, m_bot=options.m_bot, font_size=options.font_size, fit=splits.fit,
+                  binary_file=options.binary_file)
+
+
+def batch_file(filename: str, k: int) -> str:
+    """ name of the output file for the k-th matrix in batch mode, e.g. out.png becomes out-k.png
+    """
+    if filename == "" or filename == "-":
+        return filename
+    root, ext = os.path.splitext(filename)
+    if ext == ".gz":
+        root, ext2 = os.path.splitext(root)
+        ext = ext2 + ext
+    return f"{root}-{k}{ext}"
+
+
+def read_weights(weights: str, labels: [str], matrix: [[float]]) -> [[float]]:
+    """ weights for least squares: None, for FM weights 1/d^2, or 1/v for a matrix of variances v read from a file
+    """
+    if weights is None or weights == "":
+        return None
+    elif weights == "FM":
+        return distances.fm_weights(matrix)
+    else:
+        var_labels, variances = distances.read(weights)
+        order = taxon_order(labels, var_labels, weights)
+        if order is None:
+            raise IOError("Taxa of variance matrix differ from taxa of distance matrix:", weights)
+        return distances.variance_weights([[variances[i][j] for j in order] for i in order])
+
+
+def taxon_order(labels: [str], other_labels: [str], filename: str) -> [int]:
+    """ for each label, its index in other_labels, or None, if the two lists do not contain the same taxa.
+        Raises IOError, if either list contains a label more than once
+    """
+    index = {label: i for i, label in enumerate(other_labels)}
+    if len(index) != len(other_labels):
+        raise IOError("Duplicate taxon labels in:", filename)
+    if len(set(labels)) != len(labels):
+        raise IOError("Duplicate taxon labels")
+    if len(labels) != len(index) or any(label not in index for label in labels):
+        return None
+    return [index[label] for label in labels]
+
+
+def out_group(labels: [str], out_grp_labels: str) -> Set[int]:
+    """ 1-based ids of the out-group taxa given as comma-separated labels
+    """
     out_grp = set()
-    if options.out_grp_labels is not None and options.out_grp_labels != "":
-        out_grp_labels = set(options.out_grp_labels.split(","))
+    if out_grp_labels is not None and out_grp_labels != "":
+        out_grp_labels = set(out_grp_labels.split(","))
         unknown = out_grp_labels.difference(set(labels))
         if len(unknown) > 0:
             raise IOError("Unknown taxa in out-group:", unknown)
         for t in range(1, len(labels) + 1):
             if labels[t - 1] in out_grp_labels:
                 out_grp.add(t)
-
-    run(labels, matrix, outfile=options.outfile, nexus_file=options.nexus_file, graph_file=options.graph_file,
-        mode=options.mode, cutoff=options.cutoff, rooted=options.rooted, alt=options.alt, out_grp=out_grp,
-        win_width=options.win_width,win_height=options.win_height, m_left=options.m_left, m_right=options.m_right,
-        m_top=options.m_top, m_bot=options.m_bot,font_size=options.font_size)
+    return out_grp
 
 
 def run(labels: [str], matrix: [[float]], outfile: str = "", nexus_file: str = "", graph_file: str = "",
-        mode: str = "CLS", cutoff: float = 0.0,
+        mode: str = "CLS", cutoff: float = 0.0, cycle_method: str = "NNET",
+        max_size: int = 0, top_k: int = 0, weights: [[float]] = None, budget: float = 0.0,
+        checkpoint: Checkpoint = None,
         rooted: bool = False, alt: bool = False, out_grp: Set[int] = None, win_width: int = 1000, win_height: int = 800,
-        m_left: int = 100, m_right: int = 100, m_top: int = 100, m_bot: int = 100, font_size: int = 12) -> None:
+        m_left: int = 100, m_right: int = 100, m_top: int = 100, m_bot: int = 100, font_size: int = 12,
+        show: bool = True, binary_file: str = "") -> Tuple[List[int], List[Split], float]:
+    """ run neighbor-net, compute the outline and write the requested outputs
 
+        The outline is drawn to outfile or, if no outfile is given and show is set, shown in a window.
+        Returns the cycle, the splits and the fit
+    """
 
     # distances.write(labels, matrix, outfile)
 
-    cycle, splits = nnet_algorithm.neighbor_net(labels, matrix, cutoff, mode)
+    cycle, splits = nnet_algorithm.neighbor_net(labels, matrix, cutoff, mode, cycle_method, max_size, top_k,
+                                                weights, budget=budget, checkpoint=checkpoint)
+
+    fit = render(labels, matrix, cycle, splits, outfile=outfile, nexus_file=nexus_file, graph_file=graph_file,
+                 rooted=rooted, alt=alt, out_grp=out_grp, win_width=win_width, win_height=win_height, m_left=m_left,
+                 m_right=m_right, m_top=m_top, m_bot=m_bot, font_size=font_size, show=show, binary_file=binary_file)
+
+    return cycle, splits, fit
 
-    fit = distances.ls_fit(matrix, split_dist(len(labels), splits))
+
+def render(labels: [str], matrix: [[float]], cycle: [int], splits: [Split], outfile: str = "", nexus_file: str = "",
+           graph_file: str = "", rooted: bool = False, alt: bool = False, out_grp: Set[int] = None,
+           win_width: int = 1000, win_height: int = 800, m_left: int = 100, m_right: int = 100, m_top: int = 100,
+           m_bot: int = 100, font_size: int = 12, show: bool = True, fit: float = -1.0,
+           binary_file: str = "") -> float:
+    """ compute the fit and the outline for the given cycle and splits and write the requested outputs
+
+        The splits may also be given as CircularSplits. If matrix is None, the given fit is used.
+        Returns the fit
+    """
+    if isinstance(splits, CircularSplits) and (matrix is not None or nexus_file != ""):
+        split_list = splits.to_splits()
+    else:
+        split_list = splits
+
+    if matrix is not None:
+        with metrics.stage("fit"):
+            fit = distances.ls_fit(matrix, split_dist(len(labels), split_list))
 
     if nexus_file != "":
-        splits_io.print_splits_nexus(labels, splits, cycle, fit, filename=nexus_file)
+        with metrics.stage("write_nexus"):
+            splits_io.print_splits_nexus(labels, split_list, cycle, fit, filename=nexus_file)
 
-    graph, angles = splitspy.outlines.outline_algo.compute(labels, cycle, splits, rooted=rooted, out_grp=out_grp, alt=alt)
+    if binary_file != "":
+        with metrics.stage("write_binary"):
+            if not isinstance(splits, CircularSplits):
+                splits = CircularSplits.from_splits(cycle, splits)
+            splits.fit = fit
+            splits_io.write_splits_binary(labels, splits, binary_file)
+
+    with metrics.stage("outline"):
+        graph, angles = splitspy.outlines.outline_algo.compute(labels, cycle, splits, rooted=rooted, out_grp=out_grp,
+                                                               alt=alt)
 
     if graph_file != "":
-        graph.write_tgf(outfile=graph_file)
+        with metrics.stage("write_tgf"):
+            graph.write_tgf(outfile=graph_file)
+
+    if outfile != "" or show:
+        with metrics.stage("draw"):
+            from splitspy.graph import draw  # imports PIL for raster images only
+            draw.draw(outfile, graph, angles, fit, win_width, win_height,m_left, m_right, m_top, m_bot, font_size)
 
-    draw.draw(outfile, graph, angles, fit, win_width, win_height,m_left, m_right, m_top, m_bot, font_size)
+    return fit
 
 
 if __name__ == '__main__':
@@ -8,345 +8,354 @@ See: Huson et al (2021)
 LICENSE: This is open-source software released under the terms of the
 GPL (http://www.gnu.org/licenses/gpl.html).
 """
-import math
 from typing import Set, Tuple, List
-from splitspy.splits import basic_split
-from splitspy.splits.basic_split import Split, cyc_split
-from splitspy.graph.graph import Graph
-from splitspy.outlines.event import Event
-from splitspy.outlines.event import radix_sort
+
+import numpy as np
+from splitspy import metrics
+from splitspy.splits.basic_split import Split
+from splitspy.splits.circular_splits import CircularSplits
+from splitspy.graph.array_graph import ArrayGraph
+from splitspy.outlines.event import sort_events
 
 __author__ = "Daniel H. Huson"
 
 
 def compute(labels: [str], cycle: [int], splits: [Split], rooted: bool = False, alt: bool = False,
-            out_grp: Set[int] = None, use_wts=True) -> Tuple[Graph, List[float]]:
+            out_grp: Set[int] = None, use_wts=True) -> Tuple[ArrayGraph, List[float]]:
+    """ computes the outline for the given circular splits. Returns the graph, whose edges are labeled by split ids,
+        and the angles of the taxa. Use graph.to_graph() to obtain a linked-list Graph
+    """
     n_tax = len(labels)
 
+    if not isinstance(splits, CircularSplits):
+        splits = CircularSplits.from_splits(cycle, splits)
+
     if rooted:
         if out_grp is None or len(out_grp) == 0:
-            s, w1, w2 = __root_location_mid_point(alt, n_tax, cycle, splits, use_wts)
+            s, w1, w2 = __root_location_mid_point(alt, n_tax, splits, use_wts)
         else:
-            s, w1, w2 = __root_location_out_group(out_grp, splits, use_wts)
-        n_tax, labels, splits, cycle = __setup_rooted(alt, labels, splits, cycle, s, w1, w2)
+            s, w1, w2 = out_group_root_locations([out_grp], splits.cycle, splits, use_wts)[0]
+        n_tax, labels, splits = __setup_rooted(alt, labels, splits, s, w1, w2)
 
-    splits = __add_trivial(n_tax, cycle, splits)
+    splits = __add_trivial(splits)
+    cycle = splits.cycle
 
     angles = __leaf_angles(n_tax, 360.0 if not rooted else 160.0)
-    split2angle = __compute_angles(angles, cycle, splits)
-
-    events = __setup_events(n_tax, cycle, splits)
+    intervals = splits.intervals()
+    split2angle = __compute_angles(angles, intervals)
 
-    xy = [0.0, 0.0]
+    event_splits, outbound = sort_events(intervals)
+    metrics.count("events", len(event_splits))
 
-    graph = Graph()
-    start = graph.new_node(pos=xy)
+    weights = splits.weights if use_wts else np.ones(len(splits))
 
-    current_splits = frozenset()
+    positions, path = __event_nodes(event_splits, outbound, weights, split2angle, __zobrist_keys(len(splits)))
 
-    splits2node = {current_splits: start}
+    # the k-th event leads from node path[k] to node path[k+1], an edge is created the first time two nodes are joined
+    src, tar = path[:-1], path[1:]
+    _, first = np.unique(np.minimum(src, tar) * len(positions) + np.maximum(src, tar), return_index=True)
+    first = np.sort(first)
+    edge_splits = event_splits[first]
 
+    # two consecutive events for the same split enter and leave a leaf, the start node carries all other taxa
+    node_labels = {}
     taxa_found = set()
-
-    prev_event = None
-
-    prev_node = start
-    for event in events:
-        if event.is_start():
-            tmp = set(current_splits)
-            tmp.add(event.s())
-            current_splits = frozenset(tmp)
-            xy = __translate(xy, split2angle[event.s()], event.weight() if use_wts else 1)
-        else:
-            tmp = set(current_splits)
-            tmp.remove(event.s())
-            current_splits = frozenset(tmp)
-            xy = __translate(xy, split2angle[event.s()] + 180, event.weight() if use_wts else 1.0)
-
-        need_new_node = (current_splits not in splits2node)
-
-        if need_new_node:
-            v = graph.new_node(pos=xy)
-            splits2node[current_splits] = v
-        else:
-            v = splits2node[current_splits]
-            xy = v.pos
-
-        if not v.is_adjacent(prev_node):
-            graph.new_edge(prev_node, v, None, event.weight() if use_wts else 1, event.s())
-
-        if not need_new_node:
-            pass  # just closed loop
-
-        if prev_event is not None:
-            if event.s() == prev_event.s():
-                lab = []
-                for t in splits[event.s()].part_not_in(cycle[1]):
-                    lab.append(labels[t - 1])
-                    taxa_found.add(t)
-                prev_node.label = join(lab, ",")
-
-        prev_node = v
-        prev_event = event
+    for k in np.flatnonzero(event_splits[1:] == event_splits[:-1]).tolist():
+        lab = []
+        for t in sorted(splits.part(event_splits[k])):
+            lab.append(labels[t - 1])
+            taxa_found.add(t)
+        node_labels[int(path[k + 1])] = join(lab, ",")
 
     lab = []
     for t in range(1, n_tax+1):
         if t not in taxa_found:
             lab.append(labels[t-1])
     if len(lab) > 0:
-        start.label = join(lab, ",")
-
-    return graph, angles
-
-
-def __add_trivial(n_tax: int, cycle: [int], splits: [Split]) -> [Split]:
-    seen = set()
-
-    for split in splits:
-        if len(split.part1()) == 1:
-            for t in split.part1():
-                seen.add(t)
-        elif len(split.part2()) == 1:
-            for t in split.part2():
-                seen.add(t)
-
-    if len(seen) < n_tax:
-        splits = splits.copy()
-        for i in range(1, n_tax + 1):
-            if cycle[i] not in seen:
-                splits.append(cyc_split(cycle, i, i, 0))
-
-    return splits
+        node_labels[0] = join(lab, ",")
+
+    # node labels are listed in node order, as the drawing assigns the label angles in this order
+    node_labels = dict(sorted(node_labels.items()))
+
+    return ArrayGraph(positions, np.column_stack((src[first], tar[first])), weights[edge_splits], edge_splits,
+                      node_labels), angles
+
+
+def __zobrist_keys(n_splits: int) -> np.array:
+    """ random 128-bit keys for the splits, as pairs of 64-bit words. A set of active splits is identified by the
+        XOR of their keys together with their number, so the chance that two different sets are confused is
+        about 2^-128
+    """
+    rng = np.random.default_rng(n_splits)
+    return rng.integers(0, 2 ** 64, size=(n_splits, 2), dtype=np.uint64, endpoint=False)
+
+
+def __event_nodes(event_splits: np.array, outbound: np.array, weights: np.array, split_angles: np.array,
+                  keys: np.array) -> Tuple[np.array, np.array]:
+    """ computes the nodes visited by the sweep over the events
+        Returns
+        -------
+            np.array
+                positions of the nodes, one row per node in order of discovery, the start node first
+            np.array
+                path of node indices, path[k] is the node reached after the first k events
+    """
+    angles = split_angles[event_splits] + np.where(outbound, 0.0, 180.0)
+    distances = weights[event_splits]
+    steps = np.column_stack((distances * np.cos(np.pi / 180.0 * angles), distances * np.sin(np.pi / 180.0 * angles)))
+    steps[np.abs(steps) < 0.000001] = 0.0
+
+    xy = np.zeros((len(event_splits) + 1, 2))
+    np.cumsum(steps, axis=0, out=xy[1:])
+
+    # the set of active splits after each event, given by its hash and size
+    active = np.zeros((len(event_splits) + 1, 3), dtype=np.uint64)
+    np.bitwise_xor.accumulate(keys[event_splits], axis=0, out=active[1:, :2])
+    active[1:, 2] = np.cumsum(np.where(outbound, 1, -1))
+
+    _, first, inverse = np.unique(active, axis=0, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty(len(order), dtype=int)
+    rank[order] = np.arange(len(order))
+
+    return xy[first[order]], rank[inverse.reshape(-1)]
+
+
+def __add_trivial(splits: CircularSplits) -> CircularSplits:
+    """ adds a trivial split of weight 0 for each taxon that is not separated from all others by a split
+    """
+    n_tax = splits.n_tax()
+    sizes = splits.sizes()
+
+    # a part of size 1 is either a single position or, for the interval 2..n_tax, the first position
+    seen = np.zeros(n_tax + 1, dtype=bool)
+    seen[splits.starts[sizes == 1]] = True
+    seen[1] |= bool(np.any(sizes == n_tax - 1))
+
+    missing = np.flatnonzero(~seen[1:]) + 1
+    if len(missing) == 0:
+        return splits
+    starts = np.where(missing > 1, missing, 2 if n_tax > 1 else 0)
+    ends = np.where(missing > 1, missing, n_tax if n_tax > 1 else 0)
+    return splits.append(starts, ends, np.zeros(len(missing)))
 
 
 def __leaf_angles(n_tax: int, total_angle: float) -> [float]:
-    angles = [0.0]
-    for i in range(1, n_tax + 1):
-        angles.append((total_angle * (i - 1.0) / n_tax) + 270.0 - 0.5 * total_angle)
-    return angles
-
+    i = np.arange(1, n_tax + 1)
+    return [0.0] + ((total_angle * (i - 1.0) / n_tax) + 270.0 - 0.5 * total_angle).tolist()
 
-def __compute_angles(angles: [float], cycle: [int], splits: [Split]) -> [float]:
 
-    split_angle = []
+def __compute_angles(angles: [float], intervals: np.array) -> np.array:
+    angles = np.array(angles)
+    return np.mod(0.5 * (angles[intervals[:, 0]] + angles[intervals[:, 1]]), 360.0)
 
-    for sp in splits:
-        a, b = sp.interval(cycle)
-        split_angle.append(__modulo360(0.5 * (angles[a] + angles[b])))
 
-    return split_angle
-
-
-def __modulo360(angle: float) -> float:
-    while angle >= 360.0:
-        angle -= 360.0
-    while angle < 0.0:
-        angle += 360.0
-    return angle
-
-
-def __setup_events(n_tax: int, cycle: [int], splits: [Split]):
-    outbound = []
-    inbound = []
-
-    for s in range(0, len(splits)):
-        outbound.append(Event(s, cycle, splits, True))
-        inbound.append(Event(s, cycle, splits, False))
-
-    return radix_sort(n_tax, outbound, inbound)
-
-
-def __translate(xy: [float], angle: float, distance: float) -> [float]:
-    dx = distance * math.cos(math.pi / 180.0 * angle)
-    dy = distance * math.sin(math.pi / 180.0 * angle)
-
-    if math.fabs(dx) < 0.000001:
-        dx = 0.0
-    if math.fabs(dy) < 0.000001:
-        dy = 0.0
-    return [xy[0] + dx, xy[1] + dy]
-
-
-def __root_location_mid_point(alt: bool, n_tax: int, cycle: [int], splits: [Split], use_wts: bool)\
+def __root_location_mid_point(alt: bool, n_tax: int, splits: CircularSplits, use_wts: bool)\
         -> Tuple[int, float, float]:
-    dist = basic_split.split_dist(n_tax, splits)
-
-    max_dist = 0.0
-    furthest = [0, 0]
-
-    for a in range(1,n_tax+1):
-        for b in range(a+1,n_tax+1):
-            if dist[a][b] > max_dist:
-                max_dist = dist[a][b]
-                furthest = [min(a, b), max(a, b)]
-
-    split2idx = {}
-
-    sep = []
-
-    for s in range(0, len(splits)):
-        sp = splits[s]
-        if sp.separates(furthest[0], furthest[1]):
-            sep.append(sp)
-            split2idx[sp] = s
-
-    interval = __interval(furthest[0], furthest[1], cycle, alt)
-
-    triples = []
-    pos = 0
-    for sp in sep:
-        p = sp.part_in(furthest[0])
-        triples.append([len(interval.intersection(p)), len(p), split2idx[sp]])
-        pos += 1
-
-    triples.sort()
-
-    total = 0.0
-    for trp in triples:
-        sp = splits[trp[2]]
-        wgt = sp.weight if use_wts else 1.0
-        delta = total + wgt - 0.5 * max_dist
-        if delta > 0:
-            return split2idx[sp], delta, wgt - delta
-        total += wgt
-    return 1, 0.0, splits[0].weight if use_wts else 1.0
-
-
-def __interval(a: int, b: int, cycle: [int], alt: bool) -> Set[int]:
-    interval = set()
-
-    if len(cycle) > 0:
-        if alt:
-            entered = False
-            i = len(cycle) - 1
-            while True:
-                if cycle[i] == a:
-                    interval.add(a)
-                    entered = True
-                if entered and cycle[i] == b:
-                    break
-                if i == 1:
-                    i = len(cycle) - 1
-                else:
-                    i -= 1
+    """ locates the root at the midpoint of the path between the two taxa that are furthest apart.
+        The splits that separate the two taxa are ordered by where they cross the arc of the cycle
+        from the first taxon to the second (backward, if alt is set)
+    """
+    cycle = splits.cycle
+    intervals = splits.intervals()
+    weights = splits.weights if use_wts else np.ones(len(splits))
+
+    pos_a, pos_b, max_dist = __furthest_pair(n_tax, intervals, weights)
+    if max_dist > 0.0:
+        if cycle[pos_a] > cycle[pos_b]:
+            pos_a, pos_b = pos_b, pos_a
+
+        starts, ends = intervals[:, 0], intervals[:, 1]
+        in_a = (starts <= pos_a) & (pos_a <= ends)
+        in_b = (starts <= pos_b) & (pos_b <= ends)
+        sep = np.flatnonzero(in_a != in_b)
+        starts, ends, in_a = starts[sep], ends[sep], in_a[sep]
+
+        if alt:  # mirror the positions, so that the arc runs forward
+            pos_a, pos_b = n_tax + 1 - pos_a, n_tax + 1 - pos_b
+            starts, ends = n_tax + 1 - ends, n_tax + 1 - starts
+
+        # the arc from a to b consists of at most two ranges of positions
+        if pos_a <= pos_b:
+            arc = [(pos_a, pos_b)]
         else:
-            entered = False
-            i = 1
-            while True:
-                if cycle[i] == a:
-                    interval.add(a)
-                    entered = True
-                if entered and cycle[i] == b:
-                    break
-                if i >= len(cycle) - 1:
-                    i = 1
-                else:
-                    i += 1
-    return interval
-
-
-def __root_location_out_group(out_grp: Set[int],  splits: [Split],use_wts: bool) -> Tuple[int, float, float]:
-
-    if len(out_grp) > 0:
-        out_grp_splits = set()
-        out_grp_taxon = min(out_grp)
-
-        for p in range(0, len(splits)):
-            pa = splits[p].part_in(out_grp_taxon)
-            if out_grp <= pa:
-                ok = True
-                to_delete = set()
-                for q in out_grp_splits:
-                    qa = splits[q].part_in(out_grp_taxon)
-                    if qa <= pa:
-                        ok = False
-                        break
-                    elif pa <= qa:
-                        to_delete.add(q)
-                if len(to_delete) > 0:
-                    out_grp_splits.difference_update(to_delete)
-                if ok:
-                    out_grp_splits.add(p)
-
-        if len(out_grp_splits) > 0:
-            s = min(out_grp_splits)
-            return s, 0.9*splits[s].weight, 0.1*splits[s].weight
-
-    return 1, 0.0, splits[0].weight if use_wts else 1.0
-
-
-def __setup_rooted(alt: bool, labels0: [str], splits0: [Split], cycle0: [int], mid: int, w1: float, w2: float) -> Tuple:
+            arc = [(pos_a, n_tax), (1, pos_b)]
+        arc_len = sum(r - l + 1 for l, r in arc)
+        overlap = sum(np.maximum(0, np.minimum(ends, r) - np.maximum(starts, l) + 1) for l, r in arc)
+
+        # size of the part containing a and of its intersection with the arc
+        size = np.where(in_a, ends - starts + 1, n_tax - (ends - starts + 1))
+        overlap = np.where(in_a, overlap, arc_len - overlap)
+
+        order = sep[np.lexsort((sep, size, overlap))]
+        delta = np.cumsum(weights[order]) - 0.5 * max_dist
+        above = np.flatnonzero(delta > 0)
+        if len(above) > 0:
+            s = int(order[above[0]])
+            return s, float(delta[above[0]]), float(weights[s] - delta[above[0]])
+    return 1, 0.0, float(splits.weights[0]) if use_wts else 1.0
+
+
+def __furthest_pair(n_tax: int, intervals: np.array, weights: np.array) -> Tuple[int, int, float]:
+    """ finds two cycle positions whose taxa have maximum split distance, using O(n_tax) memory.
+        The distance between positions p < q is c(p) + c(q) - 2 m(p, q), where c(p) is the weight of all splits
+        whose interval contains p and m(p, q) is the weight of all splits whose interval contains both,
+        obtained for a whole row from a suffix sum over the interval ends of the splits starting at or before p
+        Returns
+        -------
+            int
+                first position
+            int
+                second position
+            float
+                distance
+    """
+    valid = intervals[:, 0] > 0
+    starts, ends, weights = intervals[valid, 0], intervals[valid, 1], weights[valid]
+
+    coverage = np.zeros(n_tax + 2)
+    np.add.at(coverage, starts, weights)
+    np.add.at(coverage, ends + 1, -weights)
+    coverage = np.cumsum(coverage)
+
+    order = np.argsort(starts, kind="stable")
+    bounds = np.searchsorted(starts[order], np.arange(n_tax + 2))
+
+    by_end = np.zeros(n_tax + 1)
+    best = (1, 1, 0.0)
+    for p in range(1, n_tax):
+        group = order[bounds[p]:bounds[p + 1]]
+        np.add.at(by_end, ends[group], weights[group])
+        both = np.cumsum(by_end[:p:-1])[::-1]
+        row = coverage[p] + coverage[p + 1:n_tax + 1] - 2.0 * both
+        q = int(np.argmax(row))
+        if row[q] > best[2]:
+            best = (p, p + 1 + q, float(row[q]))
+    return best
+
+
+def out_group_root_locations(out_grps: [Set[int]], cycle: [int], splits: [Split], use_wts: bool = True)\
+        -> [Tuple[int, float, float]]:
+    """ locates the root for each of the given out-groups. The root is placed on the split of smallest index among
+        the minimal splits that have all of the out-group on one side
+
+        Parameters
+        ----------
+            out_grps: [Set[int]]
+                out-groups, sets of taxa
+            cycle: [int]
+                1-based cycle
+            splits: [Split]
+                splits, or CircularSplits
+            use_wts: bool
+                use split weights
+        Returns
+        -------
+        [Tuple[int, float, float]]
+            for each out-group, the index of the split and the weights of its two parts after placing the root
+    """
+    if not isinstance(splits, CircularSplits):
+        splits = CircularSplits.from_splits(cycle, splits)
+    n_tax = len(cycle) - 1
+    starts, ends, weights = splits.starts, splits.ends, splits.weights
+    empty = starts == 0
+
+    taxon2pos = np.zeros(max(cycle) + 1, dtype=int)
+    taxon2pos[cycle[1:]] = np.arange(1, n_tax + 1)
+
+    result = []
+    for out_grp in out_grps:
+        s = -1
+        if len(out_grp) > 0:
+            positions = np.sort(taxon2pos[list(out_grp)])
+            pos0 = taxon2pos[min(out_grp)]
+
+            # the out-group lies on one side, if the interval contains all or none of it
+            count = np.searchsorted(positions, ends, side="right") - np.searchsorted(positions, starts, side="left")
+            candidates = np.flatnonzero(empty | (count == 0) | (count == len(positions)))
+
+            if len(candidates) > 0:
+                # the side containing the out-group is the arc lo..hi around pos0, described by its extent to the
+                # left and to the right of pos0. One such arc contains another, if both extents are not larger
+                inside = (starts[candidates] <= pos0) & (pos0 <= ends[candidates])
+                lo = np.where(inside, starts[candidates], ends[candidates] + 1)
+                hi = np.where(inside, ends[candidates], starts[candidates] - 1)
+                left = np.where(empty[candidates], n_tax, np.mod(pos0 - lo, n_tax))
+                right = np.where(empty[candidates], n_tax, np.mod(hi - pos0, n_tax))
+
+                # sweep in order of left extent: an arc is minimal, if its right extent is smaller than all before
+                order = np.lexsort((candidates, right, left))
+                right = right[order]
+                before = np.minimum.accumulate(np.concatenate(([n_tax + 1], right[:-1])))
+                s = int(candidates[order][right < before].min())
+
+        if s >= 0:
+            result.append((s, 0.9 * float(weights[s]), 0.1 * float(weights[s])))
+        else:
+            result.append((1, 0.0, float(weights[0]) if use_wts else 1.0))
+    return result
+
+
+def __setup_rooted(alt: bool, labels0: [str], splits0: CircularSplits, mid: int, w1: float, w2: float) -> Tuple:
+    """ adds a root taxon, placed on split mid with weights w1 and w2 on the two sides, by inserting it into the
+        cycle and shifting the intervals of all splits. The root becomes the first taxon of the new cycle
+    """
     labels = labels0.copy()
     labels.append("Root")
     n_tax = len(labels)
     root_id = n_tax
 
-    cycle = [0] * (len(cycle0) + 1)
-
-    first = 0
-    if not alt:
-        part = splits0[mid].part_not_in(1)
-        t = 1
-        for v in cycle0:
-            if v > 0:
-                if first == 0 and v in part:
-                    first = v
-                    cycle[t] = root_id
-                    t = t + 1
-                cycle[t] = v
-                t += 1
+    n = splits0.n_tax()
+    cycle0 = splits0.cycle
+    starts, ends = splits0.starts, splits0.ends
+    size = splits0.sizes()
+
+    # the two parts of each split are arcs of the old cycle, x (its interval) and y, given by start and length
+    x_start, x_len = starts, size
+    y_start, y_len = np.where(ends < n, ends + 1, 1), n - size
+
+    # the part of the mid split that does not contain taxon 1
+    pos1 = cycle0.index(1)
+    if not starts[mid] <= pos1 <= ends[mid]:
+        p_start, p_len, p_first, p_last = int(starts[mid]), int(size[mid]), int(starts[mid]), int(ends[mid])
     else:
-        part = splits0[mid].part_not_in(1)
-        seen = 0
-        t = 1
-        for v in cycle0:
-            if v > 0:
-                cycle[t] = v
-                t += 1
-                if v in part:
-                    seen += 1
-                    if seen == len(part):
-                        first = v
-                        cycle[t] = root_id
-                        t += 1
-
-    cycle = rotate(cycle, root_id)
-
-    total_wgt = 0.0
-
-    mid1 = splits0[mid].deepcopy()
-    mid1.part_in(1).add(root_id)
-    mid1.weight = w1
-
-    mid2 = splits0[mid].deepcopy()
-    mid2.part_not_in(1).add(root_id)
-    mid2.weight = w2
-
-    splits = []
-    for s in range(0, len(splits0)):
-        if s == mid:
-            total_wgt += mid1.weight
-            splits.append(mid1)
-        else:
-            sp = splits0[s].deepcopy()
-            p = mid1.part_not_in(root_id)
-            if set(sp.part1()) <= p:
-                sp.part2().add(root_id)
-            elif set(sp.part2()) <= p:
-                sp.part1().add(root_id)
-            elif len(sp.part_in(first)) > 1:
-                sp.part_in(first).add(root_id)
-            else:
-                sp.part_not_in(first).add(root_id)
-            splits.append(sp)
-            total_wgt += sp.weight
-
-    total_wgt += mid2.weight
-    splits.append(mid2)
-
-    splits.append(cyc_split(cycle, 2, n_tax, total_wgt / len(splits) if total_wgt > 0 else 1.0))
-
-    return n_tax, labels, splits, cycle
+        p_start, p_len = int(y_start[mid]), int(y_len[mid])
+        p_first = 1 if starts[mid] > 1 else int(ends[mid]) + 1
+        p_last = n if ends[mid] < n else int(starts[mid]) - 1
+
+    # the root is inserted before the first taxon of that part, or after its last one, and is rotated to the front
+    first = p_first if not alt else p_last
+    k = p_first if not alt else p_last % n + 1
+    cycle = [0, root_id] + cycle0[k:] + cycle0[1:k]
+
+    # the root joins the side not contained in the part, or else the side containing first, unless that is a leaf
+    x_sub = (x_len == 0) | (np.mod(x_start - p_start, n) + x_len <= p_len)
+    y_sub = (y_len == 0) | (np.mod(y_start - p_start, n) + y_len <= p_len)
+    first_in_x = (starts <= first) & (first <= ends)
+    root_in_x = np.where(x_sub, False, np.where(y_sub, True,
+                                                np.where(np.where(first_in_x, x_len, y_len) > 1, first_in_x,
+                                                         ~first_in_x)))
+
+    # the new interval of a split is its arc that does not contain the root, shifted to the new cycle. The mid
+    # split is replaced by two splits, one for each side of the root, and the trivial split of the root is added
+    arc_start = np.where(root_in_x, y_start, x_start)
+    arc_len = np.where(root_in_x, y_len, x_len)
+    arc_start[mid], arc_len[mid] = p_start, p_len
+    arc_start = np.append(arc_start, [(p_start + p_len - 1) % n + 1, 1])
+    arc_len = np.append(arc_len, [n - p_len, n])
+
+    offset = np.mod(arc_start - k, n)
+    inside = offset + arc_len <= n
+    new_starts = np.where(arc_len == 0, 0, np.where(inside, offset + 2, 2))
+    new_ends = np.where(arc_len == 0, 0, np.where(inside, offset + arc_len + 1, n + 1))
+
+    weights = np.append(splits0.weights, [w2, 0.0])
+    weights[mid] = w1
+    total_wgt = np.sum(weights[:-1])
+    weights[-1] = total_wgt / (len(weights) - 1) if total_wgt > 0 else 1.0
+    confidences = np.append(splits0.confidences, [splits0.confidences[mid], -1.0])
+
+    return n_tax, labels, CircularSplits(cycle, new_starts, new_ends, weights, confidences)
 
 
 def rotate(cycle: [int], first: int) -> [int]:
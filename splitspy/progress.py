@@ -0,0 +1,66 @@
+# progress.py
+"""Progress reporting, cancellation and time budgets for long-running computations
+
+The long-running algorithms (nnet_cycle.compute, nnet_splits.compute, nnet_splits_lp.compute)
+accept an optional progress callback, which is called once per unit of work of bounded size
+(a join, a conjugate gradient iteration, a change of the active set, a row of the LP) with a
+dict describing the current state:
+
+    {"stage": "nnet_cycle", "joins": 120, "active": 37}
+    {"stage": "nnet_splits", "cg_iterations": 15, "residual": 0.0031}
+    {"stage": "nnet_splits", "active": 1540}
+    {"stage": "nnet_splits_lp", "rows": 400}
+
+A callback can stop the computation by raising Cancelled. The least squares and LP
+computations also accept a wall-clock budget in seconds: once it is used up, they stop
+and return the best solution found so far.
+
+
+LICENSE: This is open-source software released under the terms of the
+GPL (http://www.gnu.org/licenses/gpl.html).
+"""
+import time
+from typing import Callable
+
+from splitspy import metrics
+
+__author__ = "Daniel H. Huson"
+
+
+class Cancelled(Exception):
+    """ raised by a progress callback to stop a computation
+    """
+    pass
+
+
+class Monitor:
+    def __init__(self, callback: Callable[[dict], None] = None, budget: float = 0.0):
+        """ passes progress events to a callback and keeps track of a time budget
+            Parameters
+            ----------
+                callback: Callable[[dict], None]
+                    called with each progress event, may raise Cancelled
+                budget: float
+                    wall-clock budget in seconds, 0 for no limit
+        """
+        self.callback = callback
+        self.deadline = time.perf_counter() + budget if budget > 0 else None
+        self.__exceeded = False
+
+    def report(self, event: dict) -> bool:
+        """ reports an event, returns True, if the budget has been used up
+        """
+        if self.callback is not None:
+            self.callback(event)
+        return self.exceeded()
+
+    def exceeded(self) -> bool:
+        if not self.__exceeded and self.deadline is not None and time.perf_counter() > self.deadline:
+            self.__exceeded = True
+            metrics.value("budget_exceeded", True)
+        return self.__exceeded
+
+    def remaining(self) -> float:
+        """ remaining budget in seconds, or None, if there is no limit
+        """
+        return None if self.deadline is None else max(0.0, self.deadline - time.perf_counter())
@@ -0,0 +1,200 @@
+# serve.py
+"""Runs the outline program as a long-running server with a pool of warm worker processes
+
+Jobs are JSON objects, one per line, read from standard input or from connections to a local
+Unix socket. For each job, one JSON line is written in response (to standard output or back to
+the connection), in the order in which the jobs complete.
+
+Usage:
+-----
+    outline serve [--workers N] [--socket PATH]
+
+Job format:
+----------
+    {"id": 1,
+     "matrix_file": "bees.txt",                     (or "labels": [...], "matrix": [[...], ...])
+     "options": {"mode": "CLS", "cutoff": 0.0000001, "cycle_method": "NNET", "max_size": 0, "top_k": 0,
+                 "weights": "", "budget": 0, "rooted": false, "alt": false, "out_grp": "tax1,tax2",
+                 "width": 1000, "height": 800, "m_left": 100, "m_right": 100, "m_top": 100, "m_bot": 100,
+                 "font_size": 12},
+     "outputs": {"image": "bees.png", "nexus": "bees.nex", "tgf": "bees.tgf", "binary": "bees.spl", "cycle": true,
+                 "splits": true}}
+
+    All options and outputs are optional. Response:
+
+    {"id": 1, "ok": true, "n_tax": 6, "n_splits": 12, "fit": 99.98,
+     "cycle": [...], "splits": [{"part": [1, 5], "weight": 0.002}, ...], "timings": [...]}
+
+    or {"id": 1, "ok": false, "error": "..."}, if the job failed.
+
+
+LICENSE: This is open-source software released under the terms of the
+GPL (http://www.gnu.org/licenses/gpl.html).
+"""
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from optparse import OptionParser
+
+from splitspy import metrics
+
+__author__ = "Daniel H. Huson"
+
+OPTIONS = {"mode": "CLS", "cutoff": 0.0000001, "cycle_method": "NNET", "max_size": 0, "top_k": 0, "weights": "",
+           "budget": 0.0, "rooted": False, "alt": False, "out_grp": "", "width": 1000, "height": 800,
+           "m_left": 100, "m_right": 100, "m_top": 100, "m_bot": 100, "font_size": 12}
+
+
+def process(job: dict) -> dict:
+    """ runs a single job, returns the response
+    """
+    from splitspy import outline
+    from splitspy.nnet import distances
+
+    response = {"id": job.get("id")}
+    try:
+        options = dict(OPTIONS)
+        unknown = set(job.get("options", {}).keys()).difference(OPTIONS.keys())
+        if len(unknown) > 0:
+            raise IOError(f"Unknown options: {', '.join(sorted(unknown))}")
+        options.update(job.get("options", {}))
+        outputs = job.get("outputs", {})
+
+        recorder = metrics.Metrics(trace_memory=False)
+        with metrics.recording(recorder):
+            with metrics.stage("read"):
+                if "matrix_file" in job:
+                    labels, matrix = distances.read(job["matrix_file"])
+                else:
+                    labels, matrix = job["labels"], job["matrix"]
+                    if len(matrix) != len(labels) or any(len(row) != len(labels) for row in matrix):
+                        raise IOError("Matrix must be square and have one row per label")
+
+            cycle, splits, fit = outline.run(labels, matrix, outfile=outputs.get("image", ""),
+                                             nexus_file=outputs.get("nexus", ""), graph_file=outputs.get("tgf", ""),
+                                             mode=options["mode"], cutoff=options["cutoff"],
+                                             cycle_method=options["cycle_method"], max_size=options["max_size"],
+                                             top_k=options["top_k"], budget=options["budget"],
+                                             weights=outline.read_weights(options["weights"], labels, matrix),
+                                             rooted=options["rooted"], alt=options["alt"],
+                                             out_grp=outline.out_group(labels, options["out_grp"]),
+                                             win_width=options["width"], win_height=options["height"],
+                                             m_left=options["m_left"], m_right=options["m_right"],
+                                             m_top=options["m_top"], m_bot=options["m_bot"],
+                                             font_size=options["font_size"], show=False,
+                                             binary_file=outputs.get("binary", ""))
+
+        response.update({"ok": True, "n_tax": len(labels), "n_splits": len(splits), "fit": fit})
+        if outputs.get("cycle", False):
+            response["cycle"] = cycle[1:]
+        if outputs.get("splits", False):
+            response["splits"] = [{"part": sorted(sp.part_not_in(cycle[1])), "weight": sp.weight} for sp in splits]
+        response["timings"] = [{"name": r["name"], "wall_time": r["wall_time"], "cpu_time": r["cpu_time"],
+                                "counters": r["counters"]} for r in recorder.stages]
+    except Exception as ex:
+        response.update({"ok": False, "error": f"{type(ex).__name__}: {ex}"})
+    return response
+
+
+def warm_up() -> None:
+    """ runs in each worker process: imports all modules and loads the default fonts. Anything printed by a job
+        goes to stderr, so that it cannot interfere with the responses
+    """
+    sys.stdout = sys.stderr
+    import numpy
+    import scipy.optimize
+    from splitspy import outline
+    from splitspy.nnet import nnet_splits_lp
+    from splitspy.graph import draw
+    draw.load_font(OPTIONS["font_size"] * 5)
+    draw.load_font(10 * 5)
+
+
+class Server:
+    def __init__(self, workers: int = None):
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=warm_up)
+
+    def submit(self, line: str, write) -> None:
+        """ submits the job given as a JSON line, the response is passed to write() when done
+        """
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError("Job must be a JSON object")
+        except ValueError as ex:
+            write({"id": None, "ok": False, "error": f"Invalid job: {ex}"})
+            return
+        future = self.pool.submit(process, job)
+        future.add_done_callback(lambda f: write(f.result() if f.exception() is None else
+                                                 {"id": job.get("id"), "ok": False, "error": str(f.exception())}))
+
+    def serve_stream(self, ins, outs) -> None:
+        lock = threading.Lock()
+
+        def write(response: dict) -> None:
+            with lock:
+                outs.write(json.dumps(response) + "\n")
+                outs.flush()
+
+        for line in ins:
+            if line.strip() != "":
+                self.submit(line, write)
+        self.pool.shutdown(wait=True)
+
+    def serve_socket(self, path: str) -> None:
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                lock = threading.Lock()
+                done = threading.Condition(lock)
+                count = [0, 0]
+
+                def write(response: dict) -> None:
+                    with lock:
+                        try:
+                            self.wfile.write((json.dumps(response) + "\n").encode())
+                            self.wfile.flush()
+                        except OSError:
+                            pass
+                        count[1] += 1
+                        done.notify_all()
+
+                for line in self.rfile:
+                    if line.strip() != b"":
+                        with lock:
+                            count[0] += 1
+                        server.submit(line.decode(), write)
+
+                with lock:
+                    done.wait_for(lambda: count[1] >= count[0])
+
+        if os.path.exists(path):
+            os.unlink(path)
+        with socketserver.ThreadingUnixStreamServer(path, Handler) as unix_server:
+            try:
+                unix_server.serve_forever()
+            finally:
+                os.unlink(path)
+                self.pool.shutdown(wait=True)
+
+
+def main(args: [str] = None):
+    parser = OptionParser("%prog serve [options]",
+                          description="Run as a server that reads jobs (JSON lines) from stdin or a Unix socket")
+    parser.add_option("--workers", default=os.cpu_count(), action="store", dest="workers", type="int",
+                      help="number of worker processes", metavar="N")
+    parser.add_option("--socket", default="", action="store", dest="socket",
+                      help="listen on this Unix socket instead of reading jobs from stdin", metavar="PATH")
+    (options, args) = parser.parse_args(args)
+
+    server = Server(options.workers)
+    if options.socket != "":
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # so that the socket file is removed
+        server.serve_socket(options.socket)
+    else:
+        server.serve_stream(sys.stdin, sys.stdout)
@@ -5,56 +5,58 @@ LICENSE: This is open-source software released under the terms of the
 GPL (http://www.gnu.org/licenses/gpl.html).
 """
 
-import copy
+import numpy as np
 
 __author__ = "Daniel H. Huson"
 
-from typing import Tuple, Set
+from typing import Tuple, FrozenSet
 
 
 class Split:
     def __init__(self, part1: [int], part2: [int], weight: float = 1.0, confidence= -1.0, probability=-1.0):
-        self.__part1 = set(part1)
-        self.__part2 = set(part2)
+        self.__part1 = frozenset(part1)
+        self.__part2 = frozenset(part2)
         self.weight = weight
         self.confidence = confidence
         self.probability= probability
+        self.__cycle = None
+        self.__interval = None
 
     def __str__(self):
         return f'{self.part1()} {self.weight: .8f}'
 
-    def part1(self) -> Set[int]:
+    def part1(self) -> FrozenSet[int]:
         """ get part of split
 
             Parameters
             ----------
             Returns
             -------
-            Set[int]
+            FrozenSet[int]
                 part 1
         """
         return self.__part1
 
-    def part2(self) -> Set[int]:
+    def part2(self) -> FrozenSet[int]:
         """ get other part of split
 
             Parameters
             ----------
             Returns
             -------
-            Set[int]
+            FrozenSet[int]
                 part 2
         """
 
         return self.__part2
 
-    def part_in(self, taxon: int) -> Set[int]:
+    def part_in(self, taxon: int) -> FrozenSet[int]:
         if taxon in self.part1():
             return self.part1()
         else:
             return self.part2()
 
-    def part_not_in(self, taxon: int) -> Set[int]:
+    def part_not_in(self, taxon: int) -> FrozenSet[int]:
         if taxon not in self.part1():
             return self.part1()
         else:
@@ -88,21 +90,74 @@ class Split:
         self.probability = probability
         
     def deepcopy(self):
-        return copy.deepcopy(self)
+        split = Split(self.part1(), self.part2(), self.weight, self.confidence, self.probability)
+        split.__cycle = self.__cycle
+        split.__interval = self.__interval
+        return split
 
     def interval(self, cycle: [int]) -> Tuple[int, int]:
-        p = self.part_not_in(cycle[1])
-        a = 0
-        b = 0
-        for i in range(1, len(cycle)):
-            if cycle[i] in p:
-                if a == 0:
-                    a = i
-                b = i
-        return a, b
-
-
-def compatible(splits: [Split]) -> bool:
+        """ get the first and last position in the cycle of the part that does not contain cycle[1].
+            The result is cached together with a snapshot of the cycle (a tuple), so that it is recomputed, if the
+            cycle is changed in place. Pass the cycle as a tuple to avoid copying it
+
+            Parameters
+            ----------
+                cycle: [int]
+                    1-based cycle
+            Returns
+            -------
+            Tuple[int, int]
+                first and last position, or (0, 0), if the part is empty
+        """
+        cycle = tuple(cycle)
+        if not self.has_interval(cycle):
+            p = self.part_not_in(cycle[1])
+            a = 0
+            b = 0
+            for i in range(1, len(cycle)):
+                if cycle[i] in p:
+                    if a == 0:
+                        a = i
+                    b = i
+            self.set_interval(cycle, a, b)
+        return self.__interval
+
+    def has_interval(self, cycle: [int]) -> bool:
+        cycle = tuple(cycle)
+        return self.__cycle is cycle or self.__cycle == cycle
+
+    def interval_cycle(self) -> Tuple[int, ...]:
+        """ the snapshot of the cycle for which the interval is cached, or None
+        """
+        return self.__cycle
+
+    def set_interval(self, cycle: [int], a: int, b: int) -> None:
+        self.__cycle = tuple(cycle)
+        self.__interval = (a, b)
+
+
+def compatible(splits: [Split], cycle: [int] = None) -> bool:
+    """ determines whether the splits are pairwise compatible. If a cycle is given for which all splits are circular,
+        this takes O(s log s) time, as two circular splits are compatible, if and only if their intervals are
+        nested or disjoint
+
+        Parameters
+        ----------
+            splits: [Split]
+                splits
+            cycle: [int]
+                optional 1-based cycle
+        Returns
+        -------
+        bool
+            compatible
+    """
+    if cycle is not None and len(splits) > 0:
+        bounds = intervals(cycle, splits)
+        sizes = np.array([len(sp.part_not_in(cycle[1])) for sp in splits])
+        if np.array_equal(np.where(bounds[:, 0] > 0, bounds[:, 1] - bounds[:, 0] + 1, 0), sizes):
+            return __laminar(bounds[sizes > 0])
+
     p1 = [s.part1() for s in splits]
     p2 = [s.part2() for s in splits]
 
@@ -114,6 +169,20 @@ def compatible(splits: [Split]) -> bool:
     return True
 
 
+def __laminar(bounds: np.array) -> bool:
+    """ determines whether no two of the given intervals overlap without one containing the other
+    """
+    order = np.lexsort((-bounds[:, 1], bounds[:, 0]))
+    open_ends = []
+    for a, b in bounds[order].tolist():
+        while len(open_ends) > 0 and open_ends[-1] < a:
+            open_ends.pop()
+        if len(open_ends) > 0 and b > open_ends[-1]:
+            return False
+        open_ends.append(b)
+    return True
+
+
 def split_dist(n_tax: int, splits: [Split]) -> [[float]]:
     """ computes splits-based distances between taxa
 
@@ -129,27 +198,78 @@ def split_dist(n_tax: int, splits: [Split]) -> [[float]]:
             0-based distance matrix
     """
 
-    mat = []
+    members = np.zeros((len(splits), n_tax))
+    for s in range(0, len(splits)):
+        members[s, [t - 1 for t in splits[s].part1()]] = 1.0
+    weights = np.array([sp.weight for sp in splits], dtype=float)
 
-    for a in range(1, n_tax + 1):
-        row = []
-        for b in range(1, n_tax + 1):
-            dist = 0
-            for sp in splits:
-                if sp.separates(a, b):
-                    dist += sp.weight
-            row.append(dist)
-        mat.append(row)
-    return mat
+    totals = weights @ members
+    mat = totals[:, None] + totals[None, :] - 2.0 * ((members.T * weights) @ members)
+    np.fill_diagonal(mat, 0.0)
 
+    return mat.tolist()
 
-def cyc_split(cycle: [int], pos1: int, pos2: int, wgt: float) -> Split:
-    p1 = []
-    p2 = []
 
-    for i in range(1, len(cycle)):
-        if i < pos1 or i > pos2:
-            p1.append(cycle[i])
+def intervals(cycle: [int], splits: [Split]) -> np.array:
+    """ computes the intervals of all splits relative to the cycle, see Split.interval(). Intervals that
+        are not yet cached in the splits are computed in one pass, using the position of each taxon in the cycle,
+        and cached with a snapshot of the cycle that is shared by all the splits
+
+        Parameters
+        ----------
+            cycle: [int]
+                1-based cycle
+            splits: [Split]
+                splits
+        Returns
+        -------
+        np.array
+            one row (first, last) per split
+    """
+    cycle = tuple(cycle)
+    result = np.zeros((len(splits), 2), dtype=int)
+
+    missing = []
+    known = {}  # id of each snapshot seen -> whether it equals the cycle, so that each is compared only once
+    for s in range(0, len(splits)):
+        snapshot = splits[s].interval_cycle()
+        if snapshot is not None and id(snapshot) not in known:
+            known[id(snapshot)] = snapshot is cycle or snapshot == cycle
+        if snapshot is not None and known[id(snapshot)]:
+            result[s] = splits[s].interval(snapshot)
+            if snapshot is not cycle:
+                splits[s].set_interval(cycle, int(result[s, 0]), int(result[s, 1]))
         else:
-            p2.append(cycle[i])
-    return Split(p1, p2, wgt)
+            missing.append(s)
+
+    if len(missing) > 0:
+        taxon2pos = np.zeros(max(cycle) + 1, dtype=int)
+        taxon2pos[list(cycle[1:])] = np.arange(1, len(cycle))
+
+        parts = [splits[s].part_not_in(cycle[1]) for s in missing]
+        sizes = np.array([len(p) for p in parts], dtype=int)
+        positions = taxon2pos[np.fromiter((t for p in parts for t in p), dtype=int, count=int(sizes.sum()))]
+
+        rows = np.array(missing)[sizes > 0]
+        offsets = (np.cumsum(sizes) - sizes)[sizes > 0]
+        if len(rows) > 0:
+            result[rows, 0] = np.minimum.reduceat(positions, offsets)
+            result[rows, 1] = np.maximum.reduceat(positions, offsets)
+
+        for s in missing:
+            splits[s].set_interval(cycle, int(result[s, 0]), int(result[s, 1]))
+
+    return result
+
+
+def cyc_split(cycle: [int], pos1: int, pos2: int, wgt: float) -> Split:
+    split = Split([*cycle[1:pos1], *cycle[pos2 + 1:]], cycle[pos1:pos2 + 1], wgt)
+
+    # the part not containing cycle[1] occupies positions pos1..pos2, or the positions after pos2
+    if pos1 > 1:
+        split.set_interval(cycle, pos1, pos2)
+    elif pos2 < len(cycle) - 1:
+        split.set_interval(cycle, pos2 + 1, len(cycle) - 1)
+    else:
+        split.set_interval(cycle, 0, 0)
+    return split
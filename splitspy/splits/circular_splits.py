@@ -0,0 +1,98 @@
+# circular_splits.py
+"""Circular splits represented by intervals of a cycle
+
+A split that is circular with respect to a cycle is given by the interval of cycle positions
+start..end of its part that does not contain cycle[1]. A split system is held as arrays of
+starts, ends, weights and confidences, so that transformations such as rerooting are array
+operations instead of operations on the sets of taxa of the individual splits.
+
+
+LICENSE: This is open-source software released under the terms of the
+GPL (http://www.gnu.org/licenses/gpl.html).
+"""
+from typing import Tuple
+
+import numpy as np
+
+from splitspy.splits import basic_split
+from splitspy.splits.basic_split import Split
+
+__author__ = "Daniel H. Huson"
+
+
+class CircularSplits:
+    def __init__(self, cycle: [int], starts: np.array, ends: np.array, weights: np.array = None,
+                 confidences: np.array = None):
+        """ circular splits
+            Parameters
+            ----------
+                cycle: [int]
+                    1-based cycle
+                starts: np.array
+                    first cycle position of the part of each split that does not contain cycle[1], 0 if it is empty
+                ends: np.array
+                    last cycle position of that part, 0 if it is empty
+                weights: np.array
+                    split weights, default 1
+                confidences: np.array
+                    split confidences, default -1
+        """
+        self.cycle = cycle
+        self.starts = np.asarray(starts, dtype=int)
+        self.ends = np.asarray(ends, dtype=int)
+        self.weights = np.ones(len(self.starts)) if weights is None else np.asarray(weights, dtype=float)
+        self.confidences = np.full(len(self.starts), -1.0) if confidences is None \
+            else np.asarray(confidences, dtype=float)
+        self.fit = -1.0  # least squares fit, if known
+
+    @staticmethod
+    def from_splits(cycle: [int], splits: [Split]):
+        """ the circular splits for the given splits, using the intervals cached in the splits, if any
+        """
+        intervals = basic_split.intervals(cycle, splits)
+        return CircularSplits(cycle, intervals[:, 0], intervals[:, 1], [sp.weight for sp in splits],
+                              [sp.confidence for sp in splits])
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def n_tax(self) -> int:
+        return len(self.cycle) - 1
+
+    def intervals(self) -> np.array:
+        return np.column_stack((self.starts, self.ends))
+
+    def sizes(self) -> np.array:
+        """ the size of the part of each split that does not contain cycle[1]
+        """
+        return np.where(self.starts > 0, self.ends - self.starts + 1, 0)
+
+    def part(self, s: int) -> [int]:
+        """ the taxa of the part of split s that does not contain cycle[1]
+        """
+        return self.cycle[self.starts[s]:self.ends[s] + 1] if self.starts[s] > 0 else []
+
+    def split(self, s: int) -> Split:
+        return self.__split(s, tuple(self.cycle))
+
+    def to_splits(self) -> [Split]:
+        cycle = tuple(self.cycle)
+        return [self.__split(s, cycle) for s in range(0, len(self))]
+
+    def append(self, starts: np.array, ends: np.array, weights: np.array, confidences: np.array = None):
+        """ a new split system consisting of these splits followed by the given ones
+        """
+        if confidences is None:
+            confidences = np.full(len(starts), -1.0)
+        return CircularSplits(self.cycle, np.concatenate((self.starts, starts)), np.concatenate((self.ends, ends)),
+                              np.concatenate((self.weights, weights)),
+                              np.concatenate((self.confidences, confidences)))
+
+    def __split(self, s: int, cycle: Tuple[int, ...]) -> Split:
+        """ split s, with its interval cached for the given snapshot of the cycle
+        """
+        part = set(self.part(s))
+        split = Split([t for t in cycle[1:] if t not in part], part, float(self.weights[s]),
+                      float(self.confidences[s]))
+        split.set_interval(cycle, int(self.starts[s]), int(self.ends[s]))
+        return split
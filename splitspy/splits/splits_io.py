@@ -1,77 +1,430 @@
 # splits_io.py
-"""Basic output of splits
+"""Basic input and output of splits
+
+Each writer formats whole blocks of lines and writes them to a buffered stream,
+gzip-compressed, if the file name ends on .gz. The nexus reader parses the TAXA and SPLITS
+blocks line by line and returns the splits as CircularSplits.
+
+The binary format holds the same data as fixed-width arrays, so that it is written with a
+single write and read by memory-mapping the arrays. It is laid out as follows (little-endian,
+each section padded to a multiple of 8 bytes):
+
+    header       magic "SPLITSPY", version (uint32), n_tax (uint32), n_splits (uint64),
+                 fit (float64), size of labels in bytes (uint64)
+    labels       UTF-8, separated by newlines
+    cycle        int64[n_tax+1], cycle[0]=0
+    starts       int64[n_splits]
+    ends         int64[n_splits]
+    weights      float64[n_splits]
+    confidences  float64[n_splits]
 
 LICENSE: This is open-source software released under the terms of the
 GPL (http://www.gnu.org/licenses/gpl.html).
 """
 
+import os
+import re
+import struct
 import sys
-import splitspy
+from typing import Iterator, List, Tuple
+
+import numpy as np
+from splitspy import fileio
 from splitspy.splits import basic_split
+from splitspy.splits.circular_splits import CircularSplits
 
 __author__ = "Daniel H. Huson"
 
+BINARY_MAGIC = b"SPLITSPY"
+BINARY_VERSION = 1
+__HEADER = struct.Struct("<8sIIQdQ")
+
 
 def print_splits_nexus(labels: [str], splits: [basic_split.Split], cycle: [int], fit=-1.0, show_weights=True, show_confidence=False, filename="-") -> None:
-    if filename == "-":
-        outs = sys.stdout
-    else:
-        outs = open(filename, mode="w")
-
-    print("#nexus", file=outs)
-
-    print("BEGIN taxa;", file=outs)
-    print("DIMENSIONS nTax=", len(labels), ";", sep="", file=outs)
-    print("TAXLABELS", file=outs)
-    for label in labels:
-        print("'", label, "'", sep="", file=outs)
-    print(";", file=outs)
-    print("END;", file=outs)
-
-    print("BEGIN SPLITS;", file=outs)
-    print("DIMENSIONS nTax=", len(labels), " nSplits=", len(splits), ";", sep="", file=outs)
-    print("FORMAT labels=no weights=","yes" if show_weights else "no","confidences=", "yes" if show_confidence else "no",";", file=outs)
-    print("PROPERTIES", end=" ", file=outs)
-    if fit != -1:
-        print("fit=", fit, end=" ", file=outs)
-    print("compatible" if splitspy.splits.basic_split.compatible(splits) else "cyclic", ",", sep="", file=outs)
-    print("CYCLE", end="", file=outs)
-    for i in range(1, len(cycle)):
-        print(" ", cycle[i], sep="", end="", file=outs)
-    print(";", file=outs)
-    print("MATRIX", file=outs)
+    outs = fileio.open_output(filename)
+
+    lines = ["#nexus",
+             "BEGIN taxa;",
+             f"DIMENSIONS nTax={len(labels)};",
+             "TAXLABELS"]
+    lines.extend(f"'{label}'" for label in labels)
+    lines.extend([";", "END;"])
+
+    lines.extend(["BEGIN SPLITS;",
+                  f"DIMENSIONS nTax={len(labels)} nSplits={len(splits)};",
+                  f"FORMAT labels=no weights= {'yes' if show_weights else 'no'} confidences= "
+                  f"{'yes' if show_confidence else 'no'} ;",
+                  "PROPERTIES " + (f"fit= {fit} " if fit != -1 else "")
+                  + ("compatible" if basic_split.compatible(splits, cycle) else "cyclic") + ",",
+                  "CYCLE" + "".join(" " + str(t) for t in cycle[1:]) + ";",
+                  "MATRIX"])
+    outs.write("\n".join(lines) + "\n")
+
+    names = [str(t) for t in range(0, max(cycle) + 1)]
+    rows = []
     for sp in splits:
+        row = ""
         if show_weights:
-            print(f'{sp.get_weight():.8f}', end="\t", file=outs)
+            row += f'{sp.get_weight():.8f}\t'
         if show_confidence:
-            print(f'{sp.get_confidence():.8f}', end="\t", file=outs)
-
-        first = True
-        for t in sp.part1():
-            if first:
-                first = False
-            else:
-                print(" ", end="", file=outs)
-            print(t, end="", file=outs)
-        print(",", file=outs)
-    print(";", file=outs)
-    print("END;", file=outs)
+            row += f'{sp.get_confidence():.8f}\t'
+        rows.append(row + " ".join(map(names.__getitem__, sp.part1())) + ",")
+    rows.extend([";", "END;"])
+    outs.write("\n".join(rows) + "\n")
 
     if outs != sys.stdout:
         outs.close()
 
 
 def print_splits_fasta(labels: [str], splits: [basic_split.Split], filename="-") -> None:
-    if filename == "-":
-        outs = sys.stdout
-    else:
-        outs = open(filename, mode="w")
+    outs = fileio.open_output(filename)
 
-    for i in range(0, len(labels)):
-        print(">", labels[i], sep="", file=outs)
-        for split in splits:
-            print("1" if (i + 1) in split.part1() else "0", end="", file=outs)
-        print(file=outs)
+    # taxon-by-split matrix of the characters '0' and '1', 1 if the taxon lies in part 1 of the split
+    members = np.full((len(labels), len(splits)), ord("0"), dtype=np.uint8)
+    sizes = [len(sp.part1()) for sp in splits]
+    taxa = np.fromiter((t for sp in splits for t in sp.part1()), dtype=int, count=sum(sizes))
+    members[taxa - 1, np.repeat(np.arange(len(splits)), sizes)] = ord("1")
+
+    outs.write("".join(f">{labels[i]}\n{members[i].tobytes().decode('ascii')}\n" for i in range(0, len(labels))))
 
     if outs != sys.stdout:
         outs.close()
+
+
+def write_splits_binary(labels: [str], splits: CircularSplits, filename: str) -> None:
+    """ writes the taxa and the splits in binary format, see read_splits_binary()
+    """
+    text = "\n".join(labels).encode("utf-8")
+    n_splits = len(splits)
+    sections = [__HEADER.pack(BINARY_MAGIC, BINARY_VERSION, splits.n_tax(), n_splits, splits.fit, len(text)),
+                text, bytes(-len(text) % 8),
+                np.asarray(splits.cycle, dtype="<i8").tobytes(),
+                np.asarray(splits.starts, dtype="<i8").tobytes(),
+                np.asarray(splits.ends, dtype="<i8").tobytes(),
+                np.asarray(splits.weights, dtype="<f8").tobytes(),
+                np.asarray(splits.confidences, dtype="<f8").tobytes()]
+    with open(filename, mode="wb") as outs:
+        outs.write(b"".join(sections))
+
+
+def read_splits_binary(filename: str, mmap=True) -> Tuple[List[str], CircularSplits]:
+    """ reads the taxa and the splits from a file written by write_splits_binary()
+
+        Parameters
+        ----------
+            filename: str
+                binary splits file
+            mmap: bool
+                memory-map the starts, ends, weights and confidences, rather than reading them into memory
+        Returns
+        -------
+        Tuple[List[str], CircularSplits]
+            taxon labels and splits, with the fit in splits.fit
+    """
+    with open(filename, mode="rb") as ins:
+        header = ins.read(__HEADER.size)
+        if len(header) < __HEADER.size or header[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+            raise IOError("Not a binary splits file:", filename)
+        magic, version, n_tax, n_splits, fit, text_size = __HEADER.unpack(header)
+        if version != BINARY_VERSION:
+            raise IOError(f"Unsupported binary splits file version {version}:", filename)
+        text = ins.read(text_size)
+        offset = __HEADER.size + text_size + (-text_size % 8)
+        ins.seek(offset)
+        cycle = np.frombuffer(ins.read(8 * (n_tax + 1)), dtype="<i8")
+
+    if offset + 8 * (n_tax + 1 + 4 * n_splits) > os.path.getsize(filename):
+        raise IOError("Binary splits file is truncated:", filename)
+    labels = text.decode("utf-8").split("\n") if n_tax > 0 else []
+    if len(labels) != n_tax or len(cycle) != n_tax + 1:
+        raise IOError("Binary splits file is corrupt:", filename)
+
+    offset += 8 * (n_tax + 1)
+    arrays = []
+    for dtype in ("<i8", "<i8", "<f8", "<f8"):
+        if n_splits == 0:
+            arrays.append(np.zeros(0, dtype=dtype))
+        elif mmap:
+            arrays.append(np.memmap(filename, dtype=dtype, mode="r", offset=offset, shape=(n_splits,)))
+        else:
+            arrays.append(np.fromfile(filename, dtype=dtype, count=n_splits, offset=offset))
+        offset += 8 * n_splits
+
+    splits = CircularSplits(cycle.tolist(), *arrays)
+    splits.fit = fit
+    return labels, splits
+
+
+def read_splits(filename="-") -> Tuple[List[str], CircularSplits]:
+    """ reads the taxa and the splits from a binary splits file or from a nexus file, recognized by the magic bytes
+    """
+    if filename != "-":
+        with open(filename, mode="rb") as ins:
+            if ins.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+                return read_splits_binary(filename)
+    return read_splits_nexus(filename)
+
+
+def read_splits_nexus(filename="-") -> Tuple[List[str], CircularSplits]:
+    """ reads the taxa and the splits from a nexus file, as written by print_splits_nexus() or by SplitsTree.
+        The SPLITS block must contain a CYCLE for which all splits are circular
+
+        Parameters
+        ----------
+            filename: str
+                nexus file, possibly compressed, or - for standard input
+        Returns
+        -------
+        Tuple[List[str], CircularSplits]
+            taxon labels and splits. The fit given in the PROPERTIES of the SPLITS block is kept in splits.fit
+    """
+    labels = None
+    n_tax = 0
+    cycle = None
+    weights, confidences, members, sizes = [], [], [], []
+    fit = -1.0
+
+    with fileio.open_input(filename) as ins:
+        pushback = []
+        lines = __lines(ins, pushback)
+        tokens = __tokens(lines, pushback)
+        if next(tokens, "").lower() != "#nexus":
+            raise IOError("Not a nexus file:", filename)
+
+        for token in tokens:
+            if token.lower() != "begin":
+                continue
+            block = next(tokens, "").lower()
+            __expect(tokens, ";")
+
+            if block == "taxa":
+                for token in __statements(tokens):
+                    if token == "dimensions":
+                        n_tax = int(__options(tokens).get("ntax", 0))
+                    elif token == "taxlabels":
+                        labels = [__unquote(t) for t in __until(tokens, ";")]
+                    else:
+                        __until(tokens, ";")
+                if labels is not None and n_tax > 0 and len(labels) != n_tax:
+                    raise IOError(f"Expected {n_tax} taxon labels, found: {len(labels)}")
+
+            elif block == "splits":
+                has_labels, has_weights, has_confidences = False, True, False
+                for token in __statements(tokens):
+                    if token == "dimensions":
+                        options = __options(tokens)
+                        n_tax = int(options.get("ntax", n_tax))
+                    elif token == "format":
+                        options = __options(tokens)
+                        has_labels = options.get("labels", "no").lower() in ("yes", "left")
+                        has_weights = options.get("weights", "yes").lower() == "yes"
+                        has_confidences = options.get("confidences", "no").lower() == "yes"
+                    elif token == "properties":
+                        # print_splits_nexus() ends the properties with a comma, so that the cycle follows
+                        words = __until(tokens, ";")
+                        lower = [w.lower() for w in words]
+                        if "cycle" in lower:
+                            cycle = [0] + [int(t) for t in words[lower.index("cycle") + 1:]]
+                            words = words[:lower.index("cycle")]
+                        i = lower.index("fit") if "fit" in lower else -1
+                        if 0 <= i < len(words) - 2 and words[i + 1] == "=":
+                            fit = float(words[i + 2])
+                    elif token == "cycle":
+                        cycle = [0] + [int(t) for t in __until(tokens, ";")]
+                    elif token == "matrix":
+                        __read_matrix(lines, pushback, (has_labels, has_weights, has_confidences), weights,
+                                      confidences, members, sizes)
+                    else:
+                        __until(tokens, ";")
+            else:
+                for token in tokens:
+                    if token.lower() in ("end", "endblock"):
+                        __expect(tokens, ";")
+                        break
+
+    if cycle is None:
+        raise IOError("No CYCLE in SPLITS block:", filename)
+    if labels is None:
+        labels = [str(t) for t in range(1, n_tax + 1)]
+    if sorted(cycle[1:]) != list(range(1, len(labels) + 1)):
+        raise IOError("CYCLE is not a permutation of the taxa:", filename)
+
+    members = np.concatenate(members) if len(members) > 0 else np.zeros(0, dtype=int)
+    starts, ends = __circular_intervals(cycle, members, np.array(sizes, dtype=int))
+    splits = CircularSplits(cycle, starts, ends, weights, confidences)
+    splits.fit = fit
+    return labels, splits
+
+
+def __circular_intervals(cycle: [int], members: np.array, sizes: np.array) -> Tuple[np.array, np.array]:
+    """ the interval of cycle positions of the part of each split that does not contain cycle[1], given the taxa of
+        one part of each split, concatenated
+    """
+    n_tax = len(cycle) - 1
+    n_splits = len(sizes)
+    if np.any((members < 1) | (members > n_tax)):
+        raise IOError("Unknown taxon in split")
+
+    taxon2pos = np.zeros(n_tax + 1, dtype=int)
+    taxon2pos[cycle[1:]] = np.arange(1, n_tax + 1)
+
+    rows = np.repeat(np.arange(n_splits), sizes)
+    positions = taxon2pos[members]
+    order = np.lexsort((positions, rows))
+    positions = positions[order]
+
+    nonempty = sizes > 0
+    offsets = (np.cumsum(sizes) - sizes)[nonempty]
+    p_min, p_max = np.zeros(n_splits, dtype=int), np.zeros(n_splits, dtype=int)
+    p_min[nonempty] = positions[offsets]
+    p_max[nonempty] = positions[offsets + sizes[nonempty] - 1]
+
+    # a gap between two consecutive positions of the same part, the part is circular, if it has at most one gap,
+    # none if it does not contain position 1 or if it is contiguous from position 1
+    is_gap = (np.diff(positions) > 1) & (rows[1:] == rows[:-1])
+    gaps = np.bincount(rows[1:][is_gap], minlength=n_splits)
+    gap_lo, gap_hi = np.zeros(n_splits, dtype=int), np.zeros(n_splits, dtype=int)
+    gap_lo[rows[1:][is_gap]] = positions[:-1][is_gap] + 1
+    gap_hi[rows[1:][is_gap]] = positions[1:][is_gap] - 1
+
+    full = (sizes == 0) | (sizes == n_tax)
+    has_first = p_min == 1
+    starts = np.where(full, 0, np.where(~has_first, p_min, np.where(gaps == 0, p_max + 1, gap_lo)))
+    ends = np.where(full, 0, np.where(~has_first, p_max, np.where(gaps == 0, n_tax, gap_hi)))
+
+    circular = full | (gaps == 0) | (has_first & (gaps == 1) & (p_max == n_tax))
+    if not np.all(circular):
+        raise IOError("Split is not circular with respect to the cycle:", int(np.flatnonzero(~circular)[0]) + 1)
+    return starts, ends
+
+
+__TOKEN = re.compile(r"'(?:[^']|'')*'|[;,=]|[^\s;,=']+")
+__COMMENT = re.compile(r"\[[^\[\]]*\]")
+
+
+def __lines(ins, pushback: List[str]) -> Iterator[str]:
+    """ the lines of a nexus stream with comments removed, taking pushed back text first
+    """
+    comment = ""
+    for line in ins:
+        while len(pushback) > 0:
+            yield pushback.pop()
+        if comment != "" or "[" in line:
+            line = __COMMENT.sub(" ", comment + line)
+            start = line.find("[")
+            comment, line = (line[start:], line[:start]) if start >= 0 else ("", line)
+        yield line
+    while len(pushback) > 0:
+        yield pushback.pop()
+
+
+def __tokens(lines: Iterator[str], pushback: List[str]) -> Iterator[str]:
+    """ the tokens of a nexus stream: quoted words, the punctuation ; , = and other words.
+        After a MATRIX token, the rest of its line is pushed back, so that the matrix can be read line by line
+    """
+    for line in lines:
+        words = __TOKEN.findall(line)
+        for i, word in enumerate(words):
+            if word.lower() == "matrix":
+                pushback.append(" ".join(words[i + 1:]))
+                yield word
+                break
+            yield word
+
+
+def __read_matrix(lines: Iterator[str], pushback: List[str], columns: Tuple[bool, bool, bool],
+                  weights: List[float], confidences: List[float], members: List[np.array], sizes: List[int]) -> None:
+    """ reads the rows of a splits matrix up to the terminating ;, which is consumed. Each row consists of a label,
+        weight and confidence, if present according to columns, followed by the taxa of one part, and is terminated
+        by a comma. Text after the ; is pushed back
+    """
+    row = ""
+    for line in lines:
+        if "'" in line:  # quoted labels may contain commas and semicolons
+            words = __TOKEN.findall(line)
+            end = words.index(";") if ";" in words else -1
+            if end >= 0:
+                pushback.append(" ".join(words[end + 1:]))
+                words = words[:end]
+            pieces = [[]]
+            for word in words:
+                if word == ",":
+                    pieces.append([])
+                else:
+                    pieces[-1].append(word)
+            pieces = [" ".join(piece) for piece in pieces]
+        else:
+            end = line.find(";")
+            if end >= 0:
+                pushback.append(line[end + 1:])
+                line = line[:end]
+            pieces = line.split(",")
+
+        pieces[0] = row + " " + pieces[0]
+        for piece in pieces[:-1]:
+            __add_row(piece, columns, weights, confidences, members, sizes)
+        row = pieces[-1]
+        if end >= 0:
+            __add_row(row, columns, weights, confidences, members, sizes)
+            return
+    raise IOError("Unexpected end of file, expected: ;")
+
+
+def __add_row(text: str, columns: Tuple[bool, bool, bool], weights: List[float], confidences: List[float],
+              members: List[np.array], sizes: List[int]) -> None:
+    text = text.strip()
+    if text == "":
+        return
+    has_labels, has_weights, has_confidences = columns
+    if has_labels:
+        text = text[__TOKEN.match(text).end():]
+    n_values = has_weights + has_confidences
+    fields = text.split(None, n_values)
+    if len(fields) < n_values:
+        raise IOError("Can't parse split:", text)
+    try:
+        weights.append(float(fields[0]) if has_weights else 1.0)
+        confidences.append(float(fields[n_values - 1]) if has_confidences else -1.0)
+        taxa = np.fromstring(fields[n_values], dtype=int, sep=" ") if len(fields) > n_values \
+            else np.zeros(0, dtype=int)
+    except ValueError:
+        raise IOError("Can't parse split:", text)
+    members.append(taxa)
+    sizes.append(len(taxa))
+
+
+def __statements(tokens: Iterator[str]) -> Iterator[str]:
+    """ the first words of the statements of a block, in lower case, until END; is reached
+    """
+    for token in tokens:
+        token = token.lower()
+        if token in ("end", "endblock"):
+            __expect(tokens, ";")
+            return
+        yield token
+
+
+def __until(tokens: Iterator[str], stop: str) -> List[str]:
+    result = []
+    for token in tokens:
+        if token == stop:
+            return result
+        result.append(token)
+    raise IOError("Unexpected end of file, expected:", stop)
+
+
+def __options(tokens: Iterator[str]) -> dict:
+    """ the key=value pairs of a statement, keys in lower case
+    """
+    words = __until(tokens, ";")
+    return {words[i - 1].lower(): words[i + 1] for i in range(1, len(words) - 1) if words[i] == "="}
+
+
+def __expect(tokens: Iterator[str], expected: str) -> None:
+    token = next(tokens, None)
+    if token != expected:
+        raise IOError(f"Expected '{expected}', found: {token}")
+
+
+def __unquote(token: str) -> str:
+    return token[1:-1].replace("''", "'") if len(token) >= 2 and token[0] == "'" and token[-1] == "'" else token